@@ -1,5 +1,25 @@
+# Public names and the module defining each one. Modules are imported on first access (PEP 562), so that
+# `import lyra` and short CLI calls do not pay for pandas and matplotlib until they are used.
+_EXPORTS = {
+    'process_dfs': 'core',
+    'norm': 'core',
+    'plot_lightcurve': 'plot',
+    'load_data': 'data',
+    'clean_data': 'data',
+    'aavso_conv': 'data',
+    'LightCurve': 'lightcurve',
+}
 
+__all__ = list(_EXPORTS)
 
-from .core import process_dfs , norm
-from .plot import plot_lightcurve
-from .data import load_data , clean_data , aavso_conv
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
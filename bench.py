@@ -0,0 +1,269 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from .core import norm, process_dfs
+from .data import _load, aavso_conv, clean_data
+
+# Excel worksheets hold at most this many rows, header included
+EXCEL_MAX_ROWS = 1_048_576
+
+BENCH_FORMATS = ('csv', 'tbl', 'xlsx')
+
+BENCH_STAGES = ('load_data', 'clean_data', 'norm', 'process_dfs', 'plot_lightcurve', 'aavso_conv')
+
+# Modules that importing the package or the CLI must not load
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib')
+
+# Default budget, in seconds, for `import lyra.cli` in a fresh interpreter
+STARTUP_BUDGET = 0.25
+
+# Default number of timed runs of each stage, after one untimed warm-up run
+BENCH_REPEAT = 5
+
+def make_aij_table(path, n_rows, n_cols=20, nan_rate=0.0, period=0.37, seed=0):
+    """
+    Write a synthetic AstroImageJ measurement table with a known period.
+
+    The target is a sinusoidal variable with 0.3 mag amplitude and 0.01 mag noise observed over nights of
+    8 hours; the remaining columns are comparison-star fluxes filled with noise.
+
+    Parameters:
+    path (str): Output file; the format (.csv, .tbl or .xlsx) follows the extension.
+    n_rows (int): Number of measurements.
+    n_cols (int, optional): Total number of columns (at least 6). Default is 20.
+    nan_rate (float, optional): Fraction of values set to NaN in every column except BJD_TDB. Default is 0.
+    period (float, optional): Period of the variable in days. Default is 0.37.
+    seed (int, optional): Seed of the random generator. Default is 0.
+
+    Returns:
+    str: `path`.
+    """
+    rng = np.random.default_rng(seed)
+    # Observations spread over consecutive nights, 8 hours each
+    night = rng.integers(0, max(1, n_rows // 1000), n_rows)
+    bjd = np.sort(2460000.0 + night + rng.uniform(0.0, 1.0 / 3.0, n_rows))
+    mag = 12.0 + 0.3 * np.sin(2 * np.pi * bjd / period) + rng.normal(0.0, 0.01, n_rows)
+
+    columns = {
+        'BJD_TDB': bjd,
+        'J.D.-2400000': bjd - 2400000.0,
+        'Source_AMag_T1': mag,
+        'Source_AMag_Err_T1': np.abs(rng.normal(0.01, 0.002, n_rows)),
+        'AIRMASS': rng.uniform(1.0, 2.0, n_rows),
+    }
+    for k in range(max(n_cols, 6) - len(columns)):
+        columns[f'Source-Sky_C{k + 2}'] = rng.normal(1e5, 300.0, n_rows)
+    df = pd.DataFrame(columns)
+
+    if nan_rate:
+        for column in df.columns[1:]:
+            df.loc[rng.random(n_rows) < nan_rate, column] = np.nan
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        df.to_csv(path, index=False)
+    elif extension == '.tbl':
+        df.to_csv(path, sep='\t', index=False)
+    elif extension == '.xlsx':
+        if n_rows >= EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel files hold at most {EXCEL_MAX_ROWS - 1} rows.")
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported benchmark format: {extension}")
+    return path
+
+def run_benchmarks(sizes=(1_000, 10_000, 100_000), formats=('csv', 'tbl'), n_cols=20, nan_rate=0.01,
+                   period=0.37, stages=BENCH_STAGES, output=None, directory=None, memory=True, repeat=BENCH_REPEAT):
+    """
+    Time each pipeline stage on synthetic tables and record its peak memory.
+
+    Every stage is timed on its own: one warm-up run, which pays for first imports and cold OS caches, then
+    `repeat` timed runs whose median is recorded as 'seconds' (and the fastest as 'min_seconds'). Peak memory
+    is measured in a further run under tracemalloc, so that tracing does not distort the timings. Excel sizes beyond the worksheet limit are skipped. The in-memory
+    and on-disk table caches are bypassed so that every stage parses its input.
+
+    Parameters:
+    sizes (list, optional): Numbers of rows to benchmark, e.g. up to 10_000_000. Default is (1e3, 1e4, 1e5).
+    formats (list, optional): Any of 'csv', 'tbl' and 'xlsx'. Default is ('csv', 'tbl').
+    n_cols (int, optional): Number of columns of the synthetic tables. Default is 20.
+    nan_rate (float, optional): Fraction of NaN values in the synthetic tables. Default is 0.01.
+    period (float, optional): Period of the synthetic variable. Default is 0.37.
+    stages (list, optional): Stages to run, from BENCH_STAGES. Default is all of them.
+    output (str, optional): JSON file the report is written to. Default is None.
+    directory (str, optional): Directory for the synthetic tables. Default is a temporary directory.
+    memory (bool, optional): Whether to measure peak memory. Default is True.
+    repeat (int, optional): Number of timed runs of each stage. Default is BENCH_REPEAT.
+
+    Returns:
+    dict: Report with the environment ('environment') and one entry per stage, format and size ('results').
+    """
+    workdir = directory or tempfile.mkdtemp(prefix='lyra-bench-')
+    results = []
+    try:
+        for fmt in formats:
+            if fmt not in BENCH_FORMATS:
+                raise ValueError(f"Unknown format '{fmt}'. Use one of {', '.join(BENCH_FORMATS)}.")
+            for n_rows in sizes:
+                n_rows = int(n_rows)
+                if fmt == 'xlsx' and n_rows >= EXCEL_MAX_ROWS:
+                    print(f"Skipping xlsx with {n_rows} rows (over the Excel row limit).")
+                    continue
+                path = make_aij_table(os.path.join(workdir, f'bench_{n_rows}.{fmt}'), n_rows, n_cols,
+                                      nan_rate, period)
+                for stage, func in _stage_functions(path, period, workdir, stages):
+                    times = _timed(func, repeat)
+                    seconds = float(np.median(times))
+                    peak = _peak_memory(func) if memory else None
+                    results.append({'stage': stage, 'format': fmt, 'rows': n_rows, 'cols': n_cols,
+                                    'nan_rate': nan_rate, 'seconds': seconds, 'min_seconds': min(times),
+                                    'repeat': len(times), 'peak_bytes': peak})
+                    print(f"{stage:>16} {fmt:>5} {n_rows:>10} rows  {seconds:9.4f} s"
+                          + (f"  {peak / 2**20:9.1f} MiB" if peak is not None else ''))
+                os.remove(path)
+    finally:
+        if directory is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'environment': _environment(), 'results': results}
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def compare(baseline, current, tolerance=1.2):
+    """
+    Compare two benchmark reports and list the stages that got slower or hungrier.
+
+    Timings are only compared between results measured with the same number of repeats, since a median of
+    several runs and a single cold run are not comparable; peak memory is always compared.
+
+    Parameters:
+    baseline (dict or str): Earlier report, or the path of its JSON file.
+    current (dict or str): New report, or the path of its JSON file.
+    tolerance (float, optional): Ratio of new to old value above which a result counts as a regression.
+                                 Default is 1.2.
+
+    Returns:
+    list: Dicts (stage, format, rows, metric, old, new, ratio) for every regression found.
+    """
+    baseline, current = _report(baseline), _report(current)
+    old = {(r['stage'], r['format'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        previous = old.get((result['stage'], result['format'], result['rows']))
+        if previous is None:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if not previous.get(metric) or result.get(metric) is None:
+                continue
+            if metric == 'seconds' and previous.get('repeat') != result.get('repeat'):
+                continue
+            ratio = result[metric] / previous[metric]
+            if ratio > tolerance:
+                regressions.append({'stage': result['stage'], 'format': result['format'], 'rows': result['rows'],
+                                    'metric': metric, 'old': previous[metric], 'new': result[metric],
+                                    'ratio': ratio})
+    return regressions
+
+def check_startup(budget=STARTUP_BUDGET, repeat=5, module=None):
+    """
+    Time the import of the CLI module in fresh interpreters and list the heavy modules it loads.
+
+    Parameters:
+    budget (float, optional): Largest acceptable import time in seconds. Default is STARTUP_BUDGET.
+    repeat (int, optional): Number of interpreters started; the fastest import is kept. Default is 5.
+    module (str, optional): Module to import. Default is this package's cli module.
+
+    Returns:
+    dict: 'module', 'seconds', 'budget', 'heavy' (HEAVY_MODULES that were imported) and 'ok' (True if the
+    import was within budget and loaded none of them).
+    """
+    module = module or f'{__package__}.cli'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = ('import json, sys, time\n'
+              'start = time.perf_counter()\n'
+              f'import {module}\n'
+              'seconds = time.perf_counter() - start\n'
+              f'heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n'
+              'print(json.dumps([seconds, heavy]))\n')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    runs = []
+    for _ in range(max(repeat, 1)):
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    seconds = min(run[0] for run in runs)
+    heavy = sorted(set().union(*(run[1] for run in runs)))
+    return {'module': module, 'seconds': seconds, 'budget': budget, 'heavy': heavy,
+            'ok': seconds <= budget and not heavy}
+
+def _stage_functions(path, period, workdir, stages):
+    """Yield (stage, zero-argument callable) pairs for the benchmark of one table."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = _load(path, cache=False)
+        cleaned = clean_data(df, path)
+        folded, _, _ = norm(cleaned.copy(), 'bench', period)
+
+    functions = {
+        'load_data': lambda: _load(path, cache=False),
+        'clean_data': lambda: clean_data(df, path),
+        'norm': lambda: norm(cleaned.copy(), 'bench', period),
+        'process_dfs': lambda: process_dfs([(path, 'bench')], period, clean=True, cache=False),
+        'plot_lightcurve': lambda: _render([(folded, None, None, 'bench')], os.path.join(workdir, 'bench.png')),
+        'aavso_conv': lambda: aavso_conv(path, 'BENCH', cache=False),
+    }
+    for stage in stages:
+        yield stage, functions[stage]
+
+def _render(processed_data, output):
+    # plot_lightcurve opens a window; the headless renderer does the same drawing
+    from .render import render_lightcurve
+    render_lightcurve(processed_data, output)
+
+def _timed(func, repeat=BENCH_REPEAT):
+    """Run `func` once to warm up, then return the durations of `repeat` more runs."""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _environment():
+    import matplotlib
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def _report(report):
+    if isinstance(report, str):
+        with open(report) as f:
+            return json.load(f)
+    return report
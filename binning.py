@@ -0,0 +1,123 @@
+from collections import namedtuple
+import numpy as np
+
+# Per-bin statistics of a folded light curve; `std` is the scatter of the points in each bin
+PhaseBins = namedtuple('PhaseBins', ['center', 'mean', 'median', 'std', 'count'])
+
+BIN_STATS = ('mean', 'median')
+
+def phase_bin(phase, mag, nbins=100, xlim=(0.0, 1.0)):
+    """
+    Bin a folded light curve in phase and compute the mean, median and scatter of every bin.
+
+    Means and scatter come from np.bincount sums over all points at once; medians from a single sort of
+    the points by (bin, magnitude). Empty bins are dropped.
+
+    Parameters:
+    phase (array): Phase of each point (e.g. BJD_normalized).
+    mag (array): Magnitude of each point.
+    nbins (int, optional): Number of equal-width bins across `xlim`. Default is 100.
+    xlim (tuple, optional): Phase range that is binned. Points outside it are ignored. Default is (0.0, 1.0).
+
+    Returns:
+    PhaseBins: Named tuple of arrays (center, mean, median, std, count) for the non-empty bins.
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    mag = np.asarray(mag, dtype=np.float64)
+    lo, hi = xlim
+    width = (hi - lo) / nbins
+
+    good = np.isfinite(phase) & np.isfinite(mag) & (phase >= lo) & (phase <= hi)
+    phase, mag = phase[good], mag[good]
+    index = np.minimum(((phase - lo) / width).astype(np.intp), nbins - 1)
+
+    count = np.bincount(index, minlength=nbins)
+    total = np.bincount(index, weights=mag, minlength=nbins)
+    square = np.bincount(index, weights=mag * mag, minlength=nbins)
+
+    filled = count > 0
+    n = count[filled]
+    mean = total[filled] / n
+    std = np.sqrt(np.maximum(square[filled] / n - mean * mean, 0.0))
+
+    # Sorting by (bin, magnitude) puts every bin's values in order, back to back
+    ordered = mag[np.lexsort((mag, index))]
+    start = np.concatenate(([0], np.cumsum(n)[:-1]))
+    median = 0.5 * (ordered[start + (n - 1) // 2] + ordered[start + n // 2])
+
+    center = lo + (np.flatnonzero(filled) + 0.5) * width
+    return PhaseBins(center, mean, median, std, n)
+
+def lttb(x, y, max_points):
+    """
+    Pick at most `max_points` points of a curve with Largest-Triangle-Three-Buckets downsampling.
+
+    The points are sorted by `x`, split into equal buckets, and in each bucket the point forming the
+    largest triangle with the previously kept point and the mean of the next bucket is kept. Peaks and
+    eclipses survive, unlike with plain decimation.
+
+    Parameters:
+    x (array): X values (e.g. phase).
+    y (array): Y values (e.g. magnitude).
+    max_points (int): Number of points to keep. Must be at least 3.
+
+    Returns:
+    ndarray: Indices into `x`/`y` of the kept points, in increasing `x` order.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    order = np.argsort(x, kind='stable')
+    n = order.size
+    if max_points >= n or n < 3:
+        return order
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3.")
+
+    xs, ys = x[order], y[order]
+    # Bucket edges for the n - 2 inner points; first and last points are always kept
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    sums_x = np.add.reduceat(xs[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(ys[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x / sizes, xs[-1])
+    mean_y = np.append(sums_y / sizes, ys[-1])
+
+    kept = np.empty(max_points, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for b in range(max_points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((xs[a] - mean_x[b + 1]) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (mean_y[b + 1] - ys[a]))
+        a = lo + int(np.argmax(area))
+        kept[b + 1] = a
+    return order[kept]
+
+def reduce_points(phase, mag, err=None, bins=None, bin_stat='mean', max_points=None, xlim=(0.0, 1.0)):
+    """
+    Reduce one dataset to what is drawn: phase bins, an LTTB subset, or the raw points.
+
+    Parameters:
+    phase, mag, err (array): Phase, magnitude and optional magnitude error of each point.
+    bins (int, optional): Number of phase bins. If given, one point per non-empty bin is returned with the
+                          bin scatter as its error. Default is None.
+    bin_stat (str, optional): 'mean' or 'median' value of each bin. Default is 'mean'.
+    max_points (int, optional): Cap on the number of points returned, applied with lttb. Default is None.
+    xlim (tuple, optional): Phase range used for binning. Default is (0.0, 1.0).
+
+    Returns:
+    tuple: (phase, mag, err) arrays; err is None if no errors are available.
+    """
+    if bins:
+        if bin_stat not in BIN_STATS:
+            raise ValueError(f"Unknown bin_stat '{bin_stat}'. Use one of {', '.join(BIN_STATS)}.")
+        binned = phase_bin(phase, mag, bins, xlim)
+        return binned.center, getattr(binned, bin_stat), binned.std
+
+    phase = np.asarray(phase, dtype=np.float64)
+    mag = np.asarray(mag, dtype=np.float64)
+    err = None if err is None else np.asarray(err, dtype=np.float64)
+    if max_points and phase.size > max_points:
+        keep = lttb(phase, mag, max_points)
+        phase, mag = phase[keep], mag[keep]
+        err = None if err is None else err[keep]
+    return phase, mag, err
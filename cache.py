@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Bump whenever the on-disk layout or the meaning of a cached table changes
+CACHE_VERSION = 2
+
+# pandas 3 always copies on write, so shallow copies of cached tables are safe to modify
+_PANDAS_3 = int(pd.__version__.split('.')[0]) >= 3
+
+_settings = {
+    # The on-disk cache writes to the user's home directory, so it is only used when asked for
+    'enabled': bool(os.environ.get('LYRA_CACHE')) and not os.environ.get('LYRA_NO_CACHE'),
+    'directory': os.environ.get('LYRA_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'lyra'),
+    'max_bytes': int(os.environ.get('LYRA_CACHE_MAX_BYTES', 1 << 30)),
+    'memory': not os.environ.get('LYRA_NO_MEMORY_CACHE'),
+}
+
+class MemoryCache:
+    """
+    Least-recently-used cache of loaded tables held in this process, with a budget in bytes.
+
+    Entries are DataFrames keyed by cache_key (path, modification time, size and load options), so an edited
+    file is never served stale. get() returns a copy, so neither columns added by the caller, such as the
+    BJD_normalized column of norm, nor values changed in place reach the cached table. The copy is shallow
+    when pandas copies on write (pandas 3, or the mode.copy_on_write option of pandas 2) and deep otherwise.
+    Safe to use from several threads.
+
+    Parameters:
+    max_bytes (int): Budget for the tables held, as measured by DataFrame.memory_usage(deep=True). Least
+                     recently used tables are dropped beyond it; a table larger than the budget is not kept.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()  # key -> (source, signature, DataFrame, bytes), least recently used first
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return a copy of the table stored under `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[2].copy(deep=not _copy_on_write())
+
+    def put(self, key, df, source=None, signature=None):
+        """
+        Store `df` under `key`, then drop least recently used tables until the budget is met.
+
+        `source` is the file the table was loaded from and `signature` its (mtime, size). Tables of the same
+        source with another signature are stale and dropped at once.
+        """
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self._pop(key)
+            if source is not None:
+                for stale in [k for k, entry in self._entries.items() if entry[0] == source and entry[1] != signature]:
+                    self._pop(stale)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (source, signature, df, nbytes)
+            self.nbytes += nbytes
+            self._shrink(self.max_bytes)
+
+    def resize(self, max_bytes):
+        """Change the budget, evicting tables if it shrank."""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._shrink(self.max_bytes)
+
+    def invalidate(self, source):
+        """Drop every table loaded from `source` (an absolute path). Returns the number dropped."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[0] == source]
+            for key in keys:
+                self._pop(key)
+        return len(keys)
+
+    def clear(self):
+        """Drop every table and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Return a dict with the number of 'entries', the 'bytes' held, the 'max_bytes' budget and the
+        'hits', 'misses' and 'evictions' counted since the last clear().
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[3]
+
+    def _shrink(self, max_bytes):
+        while self.nbytes > max_bytes and self._entries:
+            _, (_, _, _, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+# Tables loaded in this process; worker processes each have their own
+memory_cache = MemoryCache(int(os.environ.get('LYRA_MEMORY_CACHE_MAX_BYTES', 256 << 20)))
+
+def _copy_on_write():
+    return _PANDAS_3 or pd.get_option('mode.copy_on_write') is True
+
+def configure_cache(enabled=None, directory=None, max_bytes=None, memory=None, memory_max_bytes=None):
+    """
+    Change the settings of the on-disk table cache and the in-memory table cache used by load_data.
+
+    The defaults can also be set with the LYRA_CACHE, LYRA_NO_CACHE, LYRA_CACHE_DIR, LYRA_CACHE_MAX_BYTES,
+    LYRA_NO_MEMORY_CACHE and LYRA_MEMORY_CACHE_MAX_BYTES environment variables, which is the only way to
+    reach worker processes started with 'spawn'.
+
+    Parameters:
+    enabled (bool, optional): Whether load_data reads from and writes to the on-disk cache. It is off unless
+                              LYRA_CACHE is set.
+    directory (str, optional): Directory holding the cache entries. Default is ~/.cache/lyra.
+    max_bytes (int, optional): Size budget of the cache. Least recently used entries are evicted beyond it.
+                               Default is 1 GiB.
+    memory (bool, optional): Whether load_data keeps loaded tables in memory and reuses them.
+    memory_max_bytes (int, optional): Budget of the in-memory cache. Default is 256 MiB.
+    """
+    if enabled is not None:
+        _settings['enabled'] = bool(enabled)
+    if directory is not None:
+        _settings['directory'] = directory
+    if max_bytes is not None:
+        _settings['max_bytes'] = int(max_bytes)
+    if memory is not None:
+        _settings['memory'] = bool(memory)
+    if memory_max_bytes is not None:
+        memory_cache.resize(memory_max_bytes)
+
+def cache_enabled():
+    """Return True if load_data uses the on-disk cache by default."""
+    return _settings['enabled']
+
+def memory_cache_enabled():
+    """Return True if load_data uses the in-memory cache by default."""
+    return _settings['memory']
+
+def memory_cache_stats():
+    """Return the statistics of the in-memory table cache (see MemoryCache.stats)."""
+    return memory_cache.stats()
+
+def clear_memory_cache():
+    """Drop every table from the in-memory cache and reset its statistics."""
+    memory_cache.clear()
+
+def cache_key(filename, **options):
+    """
+    Build the cache key of a file: its absolute path, modification time and size, plus the load options.
+
+    Parameters:
+    filename (str): Path to the source file.
+    **options: Load options that change the resulting table (e.g. clean=True).
+
+    Returns:
+    str: Hex digest identifying the cache entry.
+    """
+    stat = os.stat(filename)
+    payload = json.dumps([CACHE_VERSION, os.path.abspath(filename), stat.st_mtime_ns, stat.st_size,
+                          sorted(options.items())], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def cache_get(filename, **options):
+    """
+    Return the cached DataFrame for `filename` and `options`, or None on a miss.
+
+    Numeric columns are memory-mapped from their .npy files, so a hit costs little more than the copy
+    made by the DataFrame constructor. Nothing is ever unpickled: text columns are stored as JSON, so a
+    crafted file in a shared cache directory cannot run code.
+    """
+    entry = os.path.join(_settings['directory'], cache_key(filename, **options))
+    try:
+        with open(os.path.join(entry, 'meta.json')) as f:
+            meta = json.load(f)
+        data = {column['name']: _load_values(entry, column['file']) for column in meta['columns']}
+        index = None
+        if meta['index'] is not None:
+            index = _load_values(entry, meta['index'])
+        df = pd.DataFrame(data, index=index, columns=[column['name'] for column in meta['columns']])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    # Touch the entry so eviction sees it as recently used
+    os.utime(entry)
+    return df
+
+def cache_put(filename, df, **options):
+    """
+    Store `df` in the cache under the key of `filename` and `options`, then evict entries over budget.
+
+    Writing is best effort: a table that cannot be stored (read-only directory, a column holding other
+    objects than strings and numbers, larger than the whole budget) is simply not cached.
+    """
+    directory = _settings['directory']
+    try:
+        key = cache_key(filename, **options)
+        os.makedirs(directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=directory, prefix='.tmp-')
+    except OSError:
+        return
+
+    try:
+        columns = [{'name': name, 'file': _save_values(tmp, str(i), df[name].to_numpy())}
+                   for i, name in enumerate(df.columns)]
+
+        index = None
+        if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1):
+            index = _save_values(tmp, 'index', df.index.to_numpy())
+
+        nbytes = _dir_size(tmp)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'source': os.path.abspath(filename), 'options': options, 'columns': columns,
+                       'index': index, 'bytes': nbytes}, f, default=str)
+
+        if nbytes > _settings['max_bytes']:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        entry = os.path.join(directory, key)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+    except (OSError, ValueError, TypeError):
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    _evict(_settings['max_bytes'])
+
+def _save_values(directory, stem, values):
+    """
+    Write one column to `directory` and return its file name: a .npy file for numeric dtypes, or a JSON list
+    for object columns (text), which must hold only strings, numbers and None.
+
+    Raises:
+    TypeError: If an object column holds anything else.
+    """
+    if values.dtype.kind == 'O':
+        file = f'{stem}.json'
+        with open(os.path.join(directory, file), 'w') as f:
+            json.dump([_json_value(value) for value in values], f)
+        return file
+    file = f'{stem}.npy'
+    np.save(os.path.join(directory, file), values, allow_pickle=False)
+    return file
+
+def _json_value(value):
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, np.generic) and value.dtype.kind in 'biuf':
+        return value.item()
+    raise TypeError(f"Cannot cache values of type {type(value).__name__}.")
+
+def _load_values(entry, file):
+    """Inverse of _save_values; .npy files are memory-mapped and never unpickled."""
+    path = os.path.join(entry, file)
+    if file.endswith('.json'):
+        with open(path) as f:
+            values = json.load(f)
+        if not isinstance(values, list):
+            raise ValueError(f"Malformed cache column '{path}'.")
+        return np.array(values, dtype=object)
+    return np.load(path, mmap_mode='r', allow_pickle=False)
+
+def invalidate(filename):
+    """
+    Remove every cache entry built from `filename`, whatever options it was loaded with, from the on-disk
+    and in-memory caches.
+
+    Returns:
+    int: Number of on-disk entries removed.
+    """
+    source = os.path.abspath(filename)
+    memory_cache.invalidate(source)
+    removed = 0
+    for entry, meta in _entries():
+        if meta.get('source') == source:
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+    return removed
+
+def clear_cache():
+    """Remove every entry from the on-disk cache."""
+    for entry, _ in _entries():
+        shutil.rmtree(entry, ignore_errors=True)
+
+def _entries():
+    """Yield (path, meta) for each complete entry in the cache directory."""
+    directory = _settings['directory']
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        entry = os.path.join(directory, name)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                yield entry, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+def _evict(max_bytes):
+    """Delete least recently used entries until the cache fits in `max_bytes`."""
+    entries = []
+    for entry, meta in _entries():
+        try:
+            entries.append((os.stat(entry).st_mtime, meta.get('bytes', 0), entry))
+        except OSError:
+            continue
+
+    total = sum(nbytes for _, nbytes, _ in entries)
+    for _, nbytes, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= nbytes
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
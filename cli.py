@@ -1,26 +1,428 @@
 #!/usr/bin/env python
 
+import os
 import sys
 import argparse
-from .core import process_dfs
-from .plot import plot_lightcurve
 
-def main():
-    parser = argparse.ArgumentParser(description="lyra CLI")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    argv = _enable_profile(argv)
+
+    # Subcommands are dispatched on the first argument; anything else is the plotting command
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    parser = argparse.ArgumentParser(description="lyra CLI",
+                                     epilog=f"Subcommands: {', '.join(COMMANDS)} (run 'lyra <subcommand> -h'). "
+                                            "Any command accepts --profile[=FILE] to log per-stage timing and memory as JSON.")
     parser.add_argument('files', nargs='+', help='Data files to process')
     parser.add_argument('-l', '--labels', nargs='+', help='Labels for each data file')
     parser.add_argument('-t', '--title', type=str, default='Partial Lightcurve', help='Plot title')
-    parser.add_argument('-p', '--period', type=float, default=1.0, help='Period of orbit')
+    parser.add_argument('-p', '--period', type=_period_arg, default=1.0, help="Period of orbit, or 'auto' to search for it")
+    parser.add_argument('--epoch', type=float, default=None, help='Reference epoch (BJD_TDB) at which the phase is 0')
     parser.add_argument('-c', '--clean', action='store_true', help='Perform data cleaning')
-    args = parser.parse_args()
+    parser.add_argument('--sigma', type=float, default=None, help='Clean the data and clip outliers beyond this many robust sigmas (in time and phase)')
+    caching = parser.add_mutually_exclusive_group()
+    caching.add_argument('--no-cache', action='store_true', help='Do not use the in-memory or on-disk table caches')
+    caching.add_argument('--disk-cache', action='store_true', help='Also cache parsed tables on disk (~/.cache/lyra, or LYRA_CACHE_DIR), which is off by default')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of parallel workers used to load files (0 uses all CPUs)')
+    parser.add_argument('-b', '--bins', type=int, default=None, help='Plot each dataset as this many phase bins')
+    parser.add_argument('--bin-stat', choices=('mean', 'median'), default='mean', help='Value plotted for each phase bin')
+    parser.add_argument('--max-points', type=int, default=None, help='Draw at most this many points per dataset (LTTB downsampling)')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Write the plot to this file (PNG, SVG or PDF) instead of showing it')
+    parser.add_argument('--stitch', action='store_true', help='Align the nights\' magnitude offsets and merge them into one dataset')
+    parser.add_argument('-s', '--stream', action='store_true', help='Only read the time and magnitude columns, in chunks, to save memory')
+    parser.add_argument('-e', '--ensemble', action='store_true', help='Plot differential magnitudes against an automatically selected ensemble of comparison stars')
+    parser.add_argument('--target', type=str, default='T1', help='Target aperture for --ensemble (default: T1)')
+    parser.add_argument('-f', '--fourier', action='store_true', help='Fit a Fourier series to each folded dataset and overlay it')
+    parser.add_argument('--max-order', type=int, default=8, help='Highest number of harmonics tried by --fourier (default: 8)')
+    parser.add_argument('--local', action='store_true', help='Work in this process even if a lyra server is running')
+    args = parser.parse_args(argv)
 
     if args.labels is None or len(args.labels) != len(args.files):
         print("Error: Number of labels must match the number of files.")
         return
+    if args.epoch is not None and args.period == 'auto':
+        print("Error: --epoch needs a numeric period.")
+        return 1
+    if args.ensemble and args.stream:
+        print("Error: --ensemble reads every flux column and cannot be combined with --stream.")
+        return 1
+
+    # Rendering to a file can be done by a running `lyra serve`, which has everything imported and cached
+    if args.output and not args.local and not os.environ.get('LYRA_PROFILE'):
+        status = _remote_plot(args)
+        if status is not None:
+            return status
+    return _plot(args)
 
+def _plot(args, echo=None):
+    """
+    Process, stitch and fit the files of the plotting command, then render or show them.
+
+    `echo(message, error=False)` reports progress and errors; it prints by default and collects the
+    messages when `lyra serve` runs the command. Returns the exit status: 1 if any file failed, in which case
+    the others are still plotted, or if none could be processed.
+    """
+    from .core import process_dfs
+
+    echo = echo or _echo
     dataframes = [(args.files[i], args.labels[i]) for i in range(len(args.files))]
-    processed_data = process_dfs(dataframes, args.period, clean=args.clean)
-    plot_lightcurve(processed_data, title=args.title)
+    period = args.period
+    if args.epoch is not None:
+        from .timing import Ephemeris
+        period = Ephemeris(args.epoch, period)
+    ensemble_options = {'ensemble': {'target': args.target}, 'mag_column': f'Diff_Mag_{args.target}'} if args.ensemble else {}
+    failures = []
+    clean = args.clean
+    if args.sigma:
+        clean = {'sigma': args.sigma, 'period': args.period if isinstance(args.period, float) else None}
+    processed_data = process_dfs(dataframes, period, clean=clean,
+                                 jobs=args.jobs or None, failures=failures,
+                                 cache=False if args.no_cache else (True if args.disk_cache else None),
+                                 lightcurves=True, echo=echo,
+                                 **ensemble_options, **(_stream_options() if args.stream else {}))
+    for failure in failures:
+        echo(f"Error processing {failure.filename} ({failure.label}): {failure.error}", error=True)
+    if not processed_data:
+        echo("Error: no file could be processed.", error=True)
+        return 1
+    for lc in processed_data:
+        if 'ensemble' in lc.meta:
+            info = lc.meta['ensemble']
+            rejected = f" (rejected {', '.join(info.rejected)})" if info.rejected else ''
+            echo(f"Comparison stars for {lc.label}: {', '.join(info.comparisons)}{rejected}")
+
+    if args.stitch and processed_data:
+        from .stitch import stitch
+        merged, offsets = stitch(processed_data, label=args.title)
+        for lc, offset in zip(processed_data, offsets):
+            echo(f"Offset {lc.label}: {offset:+.4f} mag")
+        processed_data = [merged]
+
+    plot_options = {'title': args.title, 'bins': args.bins, 'bin_stat': args.bin_stat, 'max_points': args.max_points}
+    if args.fourier and processed_data:
+        from .fourier import fit_fourier
+        models = fit_fourier(processed_data, max_order=args.max_order)
+        for lc, model in zip(processed_data, models):
+            if model is None:
+                echo(f"Fourier fit {lc.label}: too few points")
+                continue
+            epoch = f", BJD {model.max_epoch:.5f}" if model.max_epoch is not None else ''
+            echo(f"Fourier fit {lc.label}: order {model.order}, mean {model.mean:.4f}, "
+                 f"amplitude {model.amplitude:.4f}, maximum at phase {model.max_phase:.3f}{epoch}")
+        plot_options['models'] = models
+    if args.output:
+        from .render import render_lightcurve
+        try:
+            render_lightcurve(processed_data, args.output, **plot_options)
+        except Exception as e:
+            echo(f"Error rendering {args.output}: {e}", error=True)
+            return 1
+        echo(f"Saved plot to {args.output}")
+    else:
+        from .plot import plot_lightcurve
+        plot_lightcurve(processed_data, **plot_options)
+    return 1 if failures else 0
+
+def _remote_plot(args):
+    """
+    Run the plotting command in a running lyra server and print its messages.
+    Returns the exit status, or None when no server is running.
+    """
+    from .server import PLOT_OPTIONS, ServerError, find_server
+
+    client = find_server()
+    if client is None:
+        return None
+    options = dict({key: getattr(args, key) for key in PLOT_OPTIONS},
+                   files=[os.path.abspath(name) for name in args.files], output=os.path.abspath(args.output))
+    try:
+        reply = client.request('plot', options)
+    except (OSError, ServerError) as e:
+        print(f"Error: lyra server: {e}", file=sys.stderr)
+        return 1
+    for message, error in reply['messages']:
+        _echo(message, error)
+    return reply['status']
+
+def _echo(message, error=False):
+    print(message, file=sys.stderr if error else sys.stdout)
+
+def period_main(argv):
+    """
+    `lyra period`: search the combined files for the best periods and print them.
+    """
+    from .period import METHODS, find_period
+
+    parser = argparse.ArgumentParser(prog='lyra period', description="Search data files for the period of a variable star")
+    parser.add_argument('files', nargs='+', help='Data files to search')
+    parser.add_argument('-m', '--method', choices=METHODS, default='ls', help="'ls' (Lomb-Scargle) or 'pdm' (phase dispersion minimisation)")
+    parser.add_argument('--min-period', type=float, default=0.05, help='Shortest period searched, in days')
+    parser.add_argument('--max-period', type=float, default=None, help='Longest period searched, in days (default: time baseline)')
+    parser.add_argument('--oversample', type=int, default=5, help='Frequency grid points per peak width')
+    parser.add_argument('-n', '--peaks', type=int, default=5, help='Number of best periods to report')
+    parser.add_argument('-c', '--clean', action='store_true', help='Perform data cleaning')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes for the search (0 uses all CPUs)')
+    parser.add_argument('--plot', action='store_true', help='Plot the files folded with the best period')
+    args = parser.parse_args(argv)
+
+    dataframes = [(name, name) for name in args.files]
+    try:
+        periodogram = find_period(dataframes, clean=args.clean, method=args.method, min_period=args.min_period,
+                                  max_period=args.max_period, oversample=args.oversample, n_peaks=args.peaks,
+                                  nbins=10, jobs=args.jobs or None)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{'Rank':>4}  {'Period':>12}  {'Power':>8}")
+    for rank, (best, power) in enumerate(zip(periodogram.best_periods, periodogram.best_powers), start=1):
+        print(f"{rank:>4}  {best:>12.6f}  {power:>8.4f}")
+
+    if args.plot and len(periodogram.best_periods):
+        from .core import process_dfs
+        from .plot import plot_lightcurve
+        best = float(periodogram.best_periods[0])
+        plot_lightcurve(process_dfs(dataframes, best, clean=args.clean, **_stream_options()), title=f'Period {best:.6f}')
+
+def timing_main(argv):
+    """
+    `lyra timing`: time every minimum (or maximum) in the files, print the O-C table and the refined ephemeris.
+    """
+    from .timing import KINDS, timing_analysis
+
+    parser = argparse.ArgumentParser(prog='lyra timing', description="Measure times of minimum/maximum, build an O-C table and refine the ephemeris")
+    parser.add_argument('files', nargs='+', help='Data files to analyse')
+    parser.add_argument('-p', '--period', type=float, required=True, help='Trial period in days')
+    parser.add_argument('--epoch', type=float, default=None, help='Trial epoch (BJD_TDB) of one extremum (default: from the folded curve)')
+    parser.add_argument('-k', '--kind', choices=KINDS, default='min', help="Time minima ('min') or maxima ('max') of light")
+    parser.add_argument('-w', '--window', type=float, default=None, help='Width in days of the window fitted around each extremum (default: period / 10)')
+    parser.add_argument('-d', '--degree', type=int, default=2, help='Degree of the fitted polynomials')
+    parser.add_argument('--min-points', type=int, default=7, help='Least number of points in a fitted window')
+    parser.add_argument('-q', '--quadratic', action='store_true', help='Fit a quadratic ephemeris (period change)')
+    parser.add_argument('-c', '--clean', action='store_true', help='Perform data cleaning')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Write the O-C table to this CSV file')
+    parser.add_argument('--plot', action='store_true', help='Plot the files folded with the refined ephemeris')
+    args = parser.parse_args(argv)
+
+    dataframes = [(name, name) for name in args.files]
+    try:
+        table, ephemeris = timing_analysis(dataframes, args.period, clean=args.clean, kind=args.kind,
+                                           window=args.window, degree=args.degree, min_points=args.min_points,
+                                           epoch=args.epoch, quadratic=args.quadratic)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{'Epoch':>7}  {'Time':>15}  {'Error':>9}  {'O-C':>10}")
+    for epoch, time, error, o_c in zip(table['Epoch'], table['Time'], table['Time_Err'], table['O-C']):
+        print(f"{epoch:>7}  {time:>15.6f}  {error:>9.6f}  {o_c:>+10.6f}")
+    errors = ephemeris.errors or ()
+    print(f"Epoch:     {ephemeris.epoch:.6f} +/- {errors[0]:.6f}")
+    print(f"Period:    {ephemeris.period:.8f} +/- {errors[1]:.8f}")
+    if args.quadratic:
+        print(f"Quadratic: {ephemeris.quadratic:.4e} +/- {errors[2]:.4e}")
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Saved O-C table to {args.output}")
+    if args.plot:
+        from .core import process_dfs
+        from .plot import plot_lightcurve
+        plot_lightcurve(process_dfs(dataframes, ephemeris, clean=args.clean, **_stream_options()),
+                        title=f'Period {ephemeris.period:.6f}')
+
+def batch_main(argv):
+    """
+    `lyra batch`: run every target of a manifest, skipping targets unchanged since the last run.
+    """
+    from .pipeline import run_manifest
+
+    parser = argparse.ArgumentParser(prog='lyra batch', description="Process the targets listed in a manifest (JSON, YAML or CSV)")
+    parser.add_argument('manifest', help='Manifest file listing the targets')
+    parser.add_argument('--state', type=str, default=None, help='State file recording processed targets (default: <manifest>.state.json)')
+    parser.add_argument('-f', '--force', action='store_true', help='Re-run every target, even if unchanged')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 uses all CPUs)')
+    args = parser.parse_args(argv)
+
+    failures = []
+    try:
+        ran, skipped = run_manifest(args.manifest, state_path=args.state, jobs=args.jobs or None,
+                                    force=args.force, failures=failures)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for failure in failures:
+        print(f"Error processing target {failure.filename}: {failure.error}", file=sys.stderr)
+    print(f"Processed {len(ran)} target(s), skipped {len(skipped)} unchanged, {len(failures)} failed.")
+    return 1 if failures else 0
+
+def aavso_main(argv):
+    """
+    `lyra aavso`: convert files or directories for AAVSO submission, in a running lyra server if there is one.
+    """
+    parser = argparse.ArgumentParser(prog='lyra aavso', description="Convert photometry files to the AAVSO format")
+    parser.add_argument('inputs', nargs='+', help='Data files and/or directories to convert')
+    parser.add_argument('-n', '--star-name', required=True, help='Name of the target star')
+    parser.add_argument('-b', '--band', default='Vis.', help="Photometric band (default: 'Vis.')")
+    parser.add_argument('-o', '--output', type=str, default=None, help='Combine all inputs into this single AAVSO file')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of worker processes (0 uses all CPUs)')
+    parser.add_argument('--local', action='store_true', help='Work in this process even if a lyra server is running')
+    args = parser.parse_args(argv)
+
+    from .server import ServerError, find_server
+
+    client = None if args.local else find_server()
+    failures = []
+    if client is not None:
+        try:
+            written = client.aavso_conv(args.inputs, args.star_name, band=args.band, output=args.output,
+                                        failures=failures)
+        except (OSError, ServerError) as e:
+            print(f"Error: lyra server: {e}", file=sys.stderr)
+            return 1
+    else:
+        from .data import aavso_bulk
+        written = aavso_bulk(args.inputs, args.star_name, band=args.band, output=args.output,
+                             jobs=args.jobs or None, failures=failures)
+    for filename, _, error in failures:
+        print(f"Error converting {filename}: {error}", file=sys.stderr)
+    for path in written:
+        print(f"Saved {path}")
+    return 1 if failures else 0
+
+def watch_main(argv):
+    """
+    `lyra watch`: follow a directory of tables and refresh the folded light curve as rows arrive.
+    """
+    from .watch import watch
+
+    parser = argparse.ArgumentParser(prog='lyra watch', description="Follow a directory of AstroImageJ tables during an observing run")
+    parser.add_argument('directory', help='Directory the measurement tables are written to')
+    parser.add_argument('-p', '--period', type=float, required=True, help='Period of orbit')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Re-render the plot to this file instead of a window')
+    parser.add_argument('-i', '--interval', type=float, default=5.0, help='Seconds between directory polls')
+    parser.add_argument('-t', '--title', type=str, default='Partial Lightcurve', help='Plot title')
+    parser.add_argument('-c', '--clean', action='store_true', help='Perform data cleaning')
+    parser.add_argument('--max-points', type=int, default=None, help='Draw at most this many points per dataset (LTTB downsampling)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: {args.directory} is not a directory.", file=sys.stderr)
+        return 1
+    print(f"Watching {args.directory} every {args.interval:g} s (Ctrl+C to stop).")
+    watch(args.directory, args.period, output=args.output, interval=args.interval, clean=args.clean,
+          plot_options={'title': args.title, 'max_points': args.max_points})
+
+def serve_main(argv):
+    """
+    `lyra serve`: keep a warm lyra process answering HTTP/JSON requests on localhost.
+    """
+    from .server import serve, server_address
+
+    parser = argparse.ArgumentParser(prog='lyra serve', description="Serve the lyra pipeline over HTTP/JSON; the CLI uses it while it runs")
+    parser.add_argument('--host', default=None, help='Address to listen on (default: from LYRA_SERVER, else 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=None, help='Port to listen on (default: from LYRA_SERVER, else 8737)')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Number of requests processed at once (0 uses all CPUs)')
+    parser.add_argument('--memory-max-bytes', type=int, default=None, help='Budget of the in-memory table cache')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not log each request')
+    parser.add_argument('--stop', action='store_true', help='Stop the server running at this address')
+    args = parser.parse_args(argv)
+
+    host, port = server_address()
+    address = f'{args.host or host}:{args.port or port}'
+    if args.stop:
+        from .server import Client, ServerError
+        try:
+            Client(address).shutdown()
+        except (OSError, ServerError) as e:
+            print(f"Error: no lyra server at {address}: {e}", file=sys.stderr)
+            return 1
+        print(f"Stopped the lyra server at {address}.")
+        return 0
+    try:
+        serve(address, workers=args.jobs or None, memory_max_bytes=args.memory_max_bytes, quiet=args.quiet)
+    except OSError as e:
+        print(f"Error: cannot listen on {address}: {e}", file=sys.stderr)
+        return 1
+
+def bench_main(argv):
+    """
+    `lyra bench`: benchmark each pipeline stage on synthetic tables.
+    """
+    from .bench import BENCH_FORMATS, BENCH_REPEAT, BENCH_STAGES, STARTUP_BUDGET, check_startup, compare, run_benchmarks
+
+    parser = argparse.ArgumentParser(prog='lyra bench', description="Time and measure the memory of each pipeline stage")
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5], help='Numbers of rows (e.g. 1e3 1e5 1e7)')
+    parser.add_argument('--formats', nargs='+', choices=BENCH_FORMATS, default=['csv', 'tbl'], help='Table formats')
+    parser.add_argument('--stages', nargs='+', choices=BENCH_STAGES, default=list(BENCH_STAGES), help='Stages to run')
+    parser.add_argument('--cols', type=int, default=20, help='Number of columns of the synthetic tables')
+    parser.add_argument('--nan-rate', type=float, default=0.01, help='Fraction of NaN values')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the peak memory measurement')
+    parser.add_argument('-r', '--repeat', type=int, default=BENCH_REPEAT, help=f'Timed runs of each stage after a warm-up run; the median is kept (default: {BENCH_REPEAT})')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier JSON results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=1.2, help='Slowdown ratio reported as a regression')
+    parser.add_argument('--startup', action='store_true', help='Only check the CLI import time and that it loads no pandas/numpy/matplotlib')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help='Startup time budget in seconds for --startup')
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        result = check_startup(args.budget)
+        print(f"import {result['module']}: {result['seconds'] * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+        if result['heavy']:
+            print(f"Loaded at startup: {', '.join(result['heavy'])}")
+        return 0 if result['ok'] else 1
+
+    report = run_benchmarks(sizes=[int(n) for n in args.sizes], formats=args.formats, n_cols=args.cols,
+                            nan_rate=args.nan_rate, stages=args.stages, output=args.output,
+                            memory=not args.no_memory, repeat=args.repeat)
+    if args.compare:
+        regressions = compare(args.compare, report, tolerance=args.tolerance)
+        for r in regressions:
+            print(f"Regression: {r['stage']} {r['format']} {r['rows']} rows {r['metric']} "
+                  f"{r['old']:.4g} -> {r['new']:.4g} (x{r['ratio']:.2f})")
+        if regressions:
+            return 1
+        print("No regressions found.")
+
+def _stream_options():
+    """process_dfs options that load only the columns needed to fold and plot."""
+    from .data import AIJ_COLUMNS, DEFAULT_CHUNKSIZE
+    return {'columns': AIJ_COLUMNS, 'chunksize': DEFAULT_CHUNKSIZE}
+
+def _enable_profile(argv):
+    """
+    Handle the global --profile / --profile=FILE option and return the remaining arguments.
+    """
+    remaining = []
+    for arg in argv:
+        if arg == '--profile' or arg.startswith('--profile='):
+            from .instrument import enable_profiling
+            enable_profiling(output=arg.partition('=')[2] or '-')
+        else:
+            remaining.append(arg)
+    return remaining
+
+def _period_arg(value):
+    if value == 'auto':
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid period '{value}' (expected a number or 'auto')")
+
+COMMANDS = {
+    'period': period_main,
+    'timing': timing_main,
+    'batch': batch_main,
+    'aavso': aavso_main,
+    'watch': watch_main,
+    'bench': bench_main,
+    'serve': serve_main,
+}
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1,7 +1,18 @@
-import pandas as pd
-from .data import load_data, clean_data
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from .data import _load
+from .instrument import stage
+from .lightcurve import LightCurve
+from .timing import Ephemeris, ephemeris_phase
 
-def process_dfs(dataframes, period, clean=False, div = True):
+# Record describing a file that process_dfs could not load or fold
+FileFailure = namedtuple('FileFailure', ['filename', 'label', 'error'])
+
+def process_dfs(dataframes, period, clean=False, div = True, jobs=1, executor='process', failures=None, cache=None,
+                columns=None, chunksize=None, lightcurves=False, ensemble=None, mag_column='Source_AMag_T1',
+                echo=None):
     """
     Process multiple DataFrames:
     - Normalize BJD time column.
@@ -10,32 +21,145 @@ def process_dfs(dataframes, period, clean=False, div = True):
 
     Parameters:
     dataframes (list): List of tuples where each tuple contains (filename, label).
-    period (float): Period of orbit of target
-    clean (bool, optional): Whether to perform data cleaning on the loaded DataFrame. Default is False.
+    period (float, str or Ephemeris): Period of orbit of target. 'auto' runs a Lomb-Scargle search (see lyra.period)
+                                      over all files together and folds with the best period found. An Ephemeris
+                                      (see lyra.timing) folds with phase 0 at its epoch. None only loads the
+                                      files (with lightcurves=True, as unfolded LightCurves).
+    clean (bool or dict, optional): Whether to perform data cleaning on the loaded DataFrame. A dict of clean_data
+                                    options enables outlier clipping as well. Default is False.
+    jobs (int, optional): Number of workers used to load and fold the files. 1 processes them serially,
+                          None uses one worker per CPU. Default is 1.
+    executor (str, optional): 'process' to run workers in a process pool or 'thread' for a thread pool.
+                              Default is 'process'.
+    failures (list, optional): If given, a FileFailure(filename, label, error) record is appended for each
+                               file that could not be processed instead of printing an error message.
+    cache (bool, optional): Whether load_data may use the in-memory and on-disk table caches. Default is None,
+                            which follows the global cache settings (see lyra.cache; the on-disk cache is off
+                            unless LYRA_CACHE is set). With the in-memory cache, repeated calls on the same
+                            files only refold; it is per process, so it serves jobs=1 and thread pools.
+    columns (list, optional): Only load these columns, as float64 (e.g. lyra.data.AIJ_COLUMNS). Default is None,
+                              which loads every column.
+    chunksize (int, optional): Stream CSV/TBL files in chunks of this many rows while loading. Default is None.
+    lightcurves (bool, optional): Return folded LightCurve objects, which keep only the time, magnitude and
+                                  error arrays, instead of tuples holding the whole DataFrame. Default is False.
+    ensemble (bool or dict, optional): Run ensemble differential photometry on every file after loading
+                                       (see lyra.ensemble.ensemble_photometry); a dict passes its options, such as
+                                       target or comparisons. This adds 'Diff_Mag_<star>' columns and stores the
+                                       Ensemble in DataFrame.attrs['ensemble'] or LightCurve.meta['ensemble'].
+                                       It needs every flux column, so `columns` must not be given. Default is None.
+    mag_column (str, optional): Magnitude column folded into LightCurves and used by the 'auto' period search,
+                                e.g. 'Diff_Mag_T1' with ensemble photometry; its error column is found with
+                                lyra.data.error_column. Pass the same column to plot_lightcurve when plotting
+                                tuples. Default is 'Source_AMag_T1'.
+    echo (function, optional): Called with progress messages, such as the best period found with 'auto',
+                               instead of printing them. Default is None.
 
     Returns:
     list: List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str).
+    Results keep the order of `dataframes`; files that failed are left out. With lightcurves=True, a list of LightCurve.
     """
-    processed_data = []
+    if ensemble and columns is not None:
+        raise ValueError("Ensemble photometry needs every flux column; do not combine it with columns.")
+    auto = isinstance(period, str) and period == 'auto'
+    load_kwargs = {'clean': clean, 'cache': cache, 'columns': columns, 'chunksize': chunksize}
+    tasks = [(name_str, label_str, None if auto else period, div, load_kwargs, lightcurves, ensemble, mag_column)
+             for name_str, label_str in dataframes]
 
-    for name_str, label_str in dataframes:
-        try:
-            # Call load_data function to load DataFrame from file
-            result = load_data(name_str, clean=clean)
-            if result is None:
-                continue
+    if jobs == 1 or len(tasks) < 2:
+        results = [_process_one(task) for task in tasks]
+    else:
+        results = _run_pool(_process_one, tasks, jobs, executor)
 
-            df, column_lists = result
-            df, first_value, last_value = norm(df, label_str, period, div)
+    processed_data = []
+    for (name_str, label_str, *_), (item, error) in zip(tasks, results):
+        if error is not None:
+            if failures is None:
+                print(f"Error processing {name_str}: {error}")
+            else:
+                failures.append(FileFailure(name_str, label_str, error))
+            continue
+        processed_data.append(item)  # Include label_str in processed_data tuple
 
-            processed_data.append((df, first_value, last_value, label_str))  # Include label_str in processed_data tuple
-        except Exception as e:
-            print(f"Error processing {name_str}: {e}")
+    if auto and processed_data:
+        from .period import search_frames
+        periodogram = search_frames([item if lightcurves else item[0] for item in processed_data],
+                                    mag_column=mag_column, jobs=jobs)
+        if not len(periodogram.best_periods):
+            raise ValueError("The period search found no period; give the period explicitly.")
+        period = float(periodogram.best_periods[0])
+        (echo or print)(f"Best period found: {period:.6f}")
+        if lightcurves:
+            processed_data = [lc.fold(period, div) for lc in processed_data]
+        else:
+            processed_data = [norm(df, label_str, period, div) + (label_str,) for df, _, _, label_str in processed_data]
 
     return processed_data
 
 
-def norm(df, label_str, period, div = True):
+def _process_one(task):
+    """
+    Load and fold a single (filename, label, period, div, load_kwargs, lightcurves, ensemble, mag_column) task.
+    A period of None only loads the file.
+
+    Runs inside the pool workers, so it never raises; it returns a tuple (item, error) where exactly one
+    of the two is None.
+    """
+    name_str, label_str, period, div, load_kwargs, lightcurves, ensemble, mag_column = task
+    try:
+        df, column_lists = _load(name_str, **load_kwargs)
+        info = None
+        if ensemble:
+            from .ensemble import ensemble_photometry
+            with stage('ensemble', name_str, rows_in=len(df)):
+                df, info = ensemble_photometry(df, **(ensemble if isinstance(ensemble, dict) else {}))
+            df.attrs['ensemble'] = info
+        if lightcurves:
+            with stage('fold', label_str, rows_in=len(df)):
+                lc = LightCurve.from_frame(df, label_str, period, div, source=name_str, mag_column=mag_column)
+                if period is not None:
+                    lc.phase  # fold now, so that the profile does not count it as drawing
+            if info is not None:
+                lc.meta['ensemble'] = info
+            return lc, None
+        if period is None:
+            return (df, None, None, label_str), None
+        df, first_value, last_value = norm(df, label_str, period, div)
+        if df is None:
+            raise ValueError("BJD_TDB could not be normalized.")
+        return (df, first_value, last_value, label_str), None
+    except Exception as e:
+        return None, e
+
+
+def _run_pool(func, tasks, jobs=None, executor='process'):
+    """
+    Map `func` over `tasks` in a process or thread pool, preserving the order of `tasks`.
+    """
+    return list(_imap_pool(func, tasks, jobs, executor))
+
+
+def _imap_pool(func, tasks, jobs=None, executor='process'):
+    """
+    Like _run_pool, but yield each result as soon as it and all results before it are ready.
+    A single worker (or task) runs serially in the calling process.
+    """
+    tasks = list(tasks)
+    if executor == 'process':
+        pool_cls = ProcessPoolExecutor
+    elif executor == 'thread':
+        pool_cls = ThreadPoolExecutor
+    else:
+        raise ValueError(f"Unknown executor '{executor}'. Use 'process' or 'thread'.")
+
+    workers = min(jobs or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        yield from map(func, tasks)
+        return
+    with pool_cls(max_workers=workers) as pool:
+        yield from pool.map(func, tasks)
+
+
+def norm(df, label_str, period, div = True, epoch=None):
     """
     Helper function to process a single DataFrame:
     - Normalize BJD time column.
@@ -45,7 +169,10 @@ def norm(df, label_str, period, div = True):
     Parameters:
     df (DataFrame): Input DataFrame containing BJD_TDB and Source_AMag_T1 columns.
     label_str (str): Label for the dataset.
+    period (float or Ephemeris): Period of orbit of target, or a linear or quadratic ephemeris (see lyra.timing).
     div (bool): Whether to normalize by dividing by the period. Defaults to True.
+    epoch (float, optional): Reference epoch (BJD_TDB) at which the phase is 0. Defaults to None, which folds
+                             from BJD 0 unless `period` is an Ephemeris.
 
     Returns:
     DataFrame: Processed DataFrame.
@@ -57,13 +184,19 @@ def norm(df, label_str, period, div = True):
     if 'BJD_TDB' not in df.columns:
         raise KeyError("Column 'BJD_TDB' not found in DataFrame.")
 
-    try:
-        if div == True:
-            df['BJD_normalized'] = (df['BJD_TDB'] % period) / period
-            return df, df['BJD_normalized'].iloc[0], df['BJD_normalized'].iloc[-1]
-        else:
-            df['BJD_normalized'] = (df['BJD_TDB'] % period) 
-            return df, df['BJD_normalized'].iloc[0], df['BJD_normalized'].iloc[-1]
-    except Exception as e:
-        print(f"Error processing DataFrame: {e}")
-        return None, None, None
+    with stage('fold', label_str, rows_in=len(df)):
+        try:
+            if epoch is not None and not isinstance(period, Ephemeris):
+                period = Ephemeris(epoch, period)
+            if isinstance(period, Ephemeris):
+                df['BJD_normalized'] = ephemeris_phase(df['BJD_TDB'].to_numpy(dtype=np.float64), period, div)
+                return df, df['BJD_normalized'].iloc[0], df['BJD_normalized'].iloc[-1]
+            if div == True:
+                df['BJD_normalized'] = (df['BJD_TDB'] % period) / period
+                return df, df['BJD_normalized'].iloc[0], df['BJD_normalized'].iloc[-1]
+            else:
+                df['BJD_normalized'] = (df['BJD_TDB'] % period) 
+                return df, df['BJD_normalized'].iloc[0], df['BJD_normalized'].iloc[-1]
+        except Exception as e:
+            print(f"Error processing DataFrame: {e}")
+            return None, None, None
@@ -1,16 +1,72 @@
 import pandas as pd
+import numpy as np
 import os
+from collections import Counter
+from collections.abc import Mapping
+from . import cache as _cache
+from .instrument import stage
+from .readers import READERS, UnsupportedFormatError, iter_table, read_table
 
-def load_data(filename, clean=False):
+# Columns needed to fold and plot a light curve
+AIJ_COLUMNS = ('BJD_TDB', 'Source_AMag_T1', 'Source_AMag_Err_T1')
+
+# Rows per chunk when streaming a table with load_data(..., chunksize=...)
+DEFAULT_CHUNKSIZE = 100_000
+
+def error_column(mag_column):
+    """
+    Return the name of the uncertainty column of a magnitude column, following the AstroImageJ convention
+    of 'Err_' before the aperture: 'Source_AMag_T1' -> 'Source_AMag_Err_T1', 'Diff_Mag_C3' -> 'Diff_Mag_Err_C3'.
+    """
+    prefix, _, star = mag_column.rpartition('_')
+    return f'{prefix}_Err_{star}' if prefix else f'{mag_column}_Err'
+
+class ColumnLists(Mapping):
+    """
+    Read-only mapping of column name to a list of the column's values, built lazily.
+
+    Each list is created on first access and kept, so tables whose lists are never used pay nothing
+    for them.
+    """
+    def __init__(self, df):
+        self._df = df
+        self._lists = {}
+
+    def __getitem__(self, col):
+        if col not in self._lists:
+            self._lists[col] = self._df[col].tolist()
+        return self._lists[col]
+
+    def __iter__(self):
+        return iter(self._df.columns)
+
+    def __len__(self):
+        return len(self._df.columns)
+
+
+def load_data(filename, clean=False, cache=None, columns=None, chunksize=None):
     """
-    Load data from a CSV or Excel file into a Pandas DataFrame and extract column values as lists.
+    Load data from a CSV, TBL or Excel file (or any other format of lyra.readers) into a Pandas DataFrame and
+    extract column values as lists. The fastest installed reader for the extension is used.
 
     Parameters:
-    filename (str): Path to the CSV or Excel file to load.
-    clean (bool, optional): Whether to perform data cleaning on the loaded DataFrame. Default is False.
+    filename (str): Path to the file to load.
+    clean (bool or dict, optional): Whether to perform data cleaning on the loaded DataFrame. A dict of clean_data
+                                    options (e.g. {'sigma': 4, 'period': 0.37}) also enables outlier clipping.
+                                    Default is False.
+    cache (bool, optional): Whether to read the table from, and store it in, the in-memory and on-disk caches
+                            (see lyra.cache). Entries are keyed by path, modification time, size, `clean` and
+                            `columns`. Default is None, which follows the global setting of each cache: the
+                            in-memory cache is on and the on-disk cache (~/.cache/lyra) is off unless LYRA_CACHE
+                            is set or configure_cache(enabled=True) was called. True uses both.
+    columns (list, optional): Only read these columns, as float64 (e.g. AIJ_COLUMNS). Requested columns missing
+                              from the file are skipped. Default is None, which reads every column.
+    chunksize (int, optional): Parse CSV/TBL files in chunks of this many rows, so that only the requested
+                               columns of one chunk are held in memory at a time while reading.
 
     Returns:
-    tuple or None: If successful, returns a tuple (DataFrame, column_lists). If an error occurs (e.g., file not found,
+    tuple or None: If successful, returns a tuple (DataFrame, column_lists). column_lists is built lazily:
+    a column's list is only created when it is accessed. If an error occurs (e.g., file not found,
     parsing error), prints an error message and returns None.
 
     ******************************************************************************
@@ -25,25 +81,12 @@ def load_data(filename, clean=False):
     ******************************************************************************
     """
     try:
-        if filename.endswith('.csv'):
-            df = pd.read_csv(filename)
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            df = pd.read_excel(filename)
-        elif filename.endswith('.tbl'):
-            # Assuming the .tbl file is tab-separated
-            df = pd.read_csv(filename, delimiter='\t')
-        else:
-            print(f"Error: Unsupported file format for '{filename}'. Supported formats are CSV and Excel.")
-            return None
-        
-        if clean:
-            df = clean_data(df,filename)
-        
-        # Extract column values into lists
-        column_lists = {col: df[col].tolist() for col in df.columns}
-        
-        return df, column_lists
-    
+        return _load(filename, clean=clean, cache=cache, columns=columns, chunksize=chunksize)
+
+    except UnsupportedFormatError as e:
+        print(f"Error: {e}")
+        return None
+
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
         return None
@@ -52,32 +95,189 @@ def load_data(filename, clean=False):
         print(f"Error parsing '{filename}': {e}")
         return None
 
-def clean_data(df, df_name="DataFrame"):
+def _load(filename, clean=False, cache=None, columns=None, chunksize=None):
+    """
+    Load a file like load_data, but raise on failure instead of printing an error and returning None.
+    """
+    columns = None if columns is None else tuple(columns)
+    use_cache = _cache.cache_enabled() if cache is None else cache
+    use_memory = _cache.memory_cache_enabled() if cache is None else cache
+    df = None
+    memory_key = None
+    if use_memory and os.path.isfile(filename):
+        memory_key = _cache.cache_key(filename, clean=clean, columns=columns)
+        df = _cache.memory_cache.get(memory_key)
+        if df is not None:
+            return df, ColumnLists(df)
+
+    if use_cache and os.path.isfile(filename):
+        with stage('cache_read', filename) as timer:
+            df = _cache.cache_get(filename, clean=clean, columns=columns)
+            timer.set(hit=df is not None, rows_out=None if df is None else len(df))
+
+    if df is None:
+        with stage('parse', filename) as timer:
+            df = read_table(filename, columns, chunksize=chunksize)
+            timer.set(bytes_read=os.path.getsize(filename), rows_out=len(df), cols_out=len(df.columns))
+        if clean:
+            df = clean_data(df,filename, **(clean if isinstance(clean, dict) else {}))
+        if use_cache:
+            with stage('cache_write', filename):
+                _cache.cache_put(filename, df, clean=clean, columns=columns)
+
+    if memory_key is not None:
+        stat = os.stat(filename)
+        _cache.memory_cache.put(memory_key, df, os.path.abspath(filename), (stat.st_mtime_ns, stat.st_size))
+        df = df.copy(deep=False)
+    return df, ColumnLists(df)
+
+def iter_chunks(filename, columns=AIJ_COLUMNS, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream a table as DataFrames of at most `chunksize` rows holding only `columns`, as float64.
+
+    CSV and TBL files are parsed incrementally; Excel and binary files cannot be, so they are read once
+    (still projected to `columns`) and then sliced.
+
+    Parameters:
+    filename (str): Path to the table, in any format of lyra.readers.
+    columns (list, optional): Columns to read. None reads every column. Default is AIJ_COLUMNS.
+    chunksize (int, optional): Maximum number of rows per chunk. Default is DEFAULT_CHUNKSIZE.
+
+    Yields:
+    DataFrame: Consecutive chunks of the table.
+    """
+    yield from iter_table(filename, columns, chunksize)
+
+def clean_data(df, df_name="DataFrame", columns=AIJ_COLUMNS, sigma=None, window=25, period=None, nbins=20,
+               maxiter=5, mag_column='Source_AMag_T1', return_mask=False):
     """
-    Clean the input DataFrame by removing rows with missing values (NaN).
+    Clean the input DataFrame by removing rows with missing values (NaN) and, optionally, photometric outliers.
+
+    Outliers (cosmic rays, clouds, satellite trails) are found by iterative sigma clipping of the magnitudes
+    against a rolling median in time and, when a period is given, against the median of their phase bin.
+    Everything is done with sorts, rolling windows and bincount-style reductions over whole columns, so
+    the cost stays O(n log n) for tables of millions of rows.
 
     Parameters:
     df (DataFrame): Input DataFrame containing data to be cleaned.
+    df_name (str, optional): Name of the data used in messages. Default is "DataFrame".
+    columns (list, optional): Only rows with a NaN in one of these columns are removed; listed columns missing
+                              from `df` are ignored. None checks every column. Default is AIJ_COLUMNS.
+    sigma (float, optional): Clip points deviating from the median by more than `sigma` robust standard
+                             deviations (1.4826 * MAD). Default is None, which does no clipping.
+    window (int, optional): Number of points in the rolling median in time. None skips the time clipping.
+                            Default is 25.
+    period (float, optional): Also clip within `nbins` phase bins of this period. Default is None.
+    nbins (int, optional): Number of phase bins used with `period`. Default is 20.
+    maxiter (int, optional): Maximum number of clipping iterations. Default is 5.
+    mag_column (str, optional): Magnitude column that is clipped. Default is 'Source_AMag_T1'.
+    return_mask (bool, optional): Also return the mask of rejected rows. Default is False.
 
     Returns:
-    DataFrame: Cleaned DataFrame with rows containing any NaN values removed.
+    DataFrame: Cleaned DataFrame with rejected rows removed.
+    Series: If return_mask is True, a boolean Series aligned with `df` that is True for every removed row.
 
     """
     # Check if 'BJD_TDB' column exists in the DataFrame
     if 'BJD_TDB' not in df.columns:
         raise KeyError("Column 'BJD_TDB' not found in DataFrame.")
 
-    # Implement data cleaning steps as needed
-    # Example: Handling missing values or outliers
-    df_clean = df.dropna()
+    with stage('clean', df_name, rows_in=len(df)) as timer:
+        subset = df if columns is None else df[[col for col in columns if col in df.columns]]
+        missing = subset.isna().any(axis=1).to_numpy()
+
+        # Print message if no NaN values were found
+        if not missing.any():
+            print(f"No NaN values found in {df_name}.")
+
+        rejected = missing
+        if sigma:
+            if mag_column not in df.columns:
+                raise KeyError(f"Column '{mag_column}' not found in DataFrame.")
+            clipped = _sigma_clip(df['BJD_TDB'].to_numpy(dtype=np.float64), df[mag_column].to_numpy(dtype=np.float64),
+                                  ~missing, sigma, window, period, nbins, maxiter)
+            print(f"Rejected {np.count_nonzero(clipped)} outlier(s) in {df_name}.")
+            rejected = missing | clipped
+
+        df_clean = df[~rejected]
+        timer.set(rows_out=len(df_clean))
+
+        if return_mask:
+            return df_clean, pd.Series(rejected, index=df.index, name='rejected')
+        return df_clean
+
+def _sigma_clip(time, mag, keep, sigma, window, period, nbins, maxiter):
+    """
+    Iteratively flag outliers among the rows in `keep`. Returns the boolean array of clipped rows.
+    """
+    initial = keep.copy()
+    keep = keep & np.isfinite(time) & np.isfinite(mag)
+    order = np.argsort(time, kind='stable')
+    if period:
+        bins = np.minimum((((time % period) / period) * nbins).astype(np.intp), nbins - 1)
+
+    for _ in range(maxiter):
+        new = np.zeros(mag.size, dtype=bool)
+
+        if window:
+            # Rolling median over the kept points only; rejected points are NaN and skipped by the window
+            ordered = np.where(keep, mag, np.nan)[order]
+            median = pd.Series(ordered).rolling(window, center=True, min_periods=1).median().to_numpy()
+            residual = np.empty(mag.size)
+            residual[order] = ordered - median
+            scale = 1.4826 * _median(np.abs(residual[keep] - _median(residual[keep])))
+            if scale > 0:
+                new |= keep & (np.abs(residual) > sigma * scale)
+
+        if period:
+            median = _group_median(mag[keep], bins[keep], nbins)
+            residual = mag - median[bins]
+            scale = 1.4826 * _group_median(np.abs(residual[keep]), bins[keep], nbins)
+            with np.errstate(invalid='ignore'):
+                new |= keep & (scale[bins] > 0) & (np.abs(residual) > sigma * scale[bins])
 
-    # Print message if no NaN values were found
-    if df_clean.shape == df.shape:
-        print(f"No NaN values found in {df_name}.")
+        if not new.any():
+            break
+        keep &= ~new
 
-    return df_clean
+    return initial & ~keep
 
-def aavso_conv(input_file_path, star_name, band ='Vis.'):
+def _median(values):
+    return np.median(values) if values.size else np.nan
+
+def _group_median(values, groups, ngroups):
+    """
+    Median of `values` within each of `ngroups` groups from a single sort; NaN for empty groups.
+    """
+    counts = np.bincount(groups, minlength=ngroups)
+    ordered = values[np.lexsort((values, groups))]
+    start = np.cumsum(counts) - counts
+    median = np.full(ngroups, np.nan)
+    filled = counts > 0
+    n, first = counts[filled], start[filled]
+    median[filled] = 0.5 * (ordered[first + (n - 1) // 2] + ordered[first + n // 2])
+    return median
+
+# AstroImageJ column -> AAVSO column
+AAVSO_LABEL_MAPPING = {
+    'J.D.-2400000': 'JD',
+    'Source_AMag_T1': 'Magnitude',
+    'Source_AMag_Err_T1': 'Uncertainty',
+    'Band': 'Band',
+    'AIRMASS': 'Airmass',
+    # Add more mappings as needed
+}
+
+# AAVSO output columns in the desired order
+AAVSO_COLUMNS = [
+    'JD', 'Magnitude', 'Uncertainty', 'HQuncertainty', 'Band', 'Observer Code', 
+    'Comment Code(s)', 'Comp Star 1', 'Comp Star 2', 'Charts', 'Comments', 
+    'Transformed', 'Airmass', 'Validation Flag', 'Cmag', 'Kmag', 'HJD', 
+    'Star Name', 'Observer Affiliation', 'Measurement Method', 
+    'Grouping Method', 'ADS Reference', 'Digitizer', 'Credit'
+]
+
+def aavso_conv(input_file_path, star_name, band ='Vis.', cache=None):
     """
     Convert photometry data files for use in the AAVSO VStar program.
 
@@ -96,65 +296,18 @@ def aavso_conv(input_file_path, star_name, band ='Vis.'):
                          in the 'Star Name' column of the output file.
         band (str): The photometric band utalized during the observation. Defaults to 'Vis.'. 
                     This value will be used in the 'Band' column of the output file.
-    """
-    
-    # Define the column mappings
-    label_mapping = {
-        'J.D.-2400000': 'JD',
-        'Source_AMag_T1': 'Magnitude',
-        'Source_AMag_Err_T1': 'Uncertainty',
-        'Band': 'Band',
-        'AIRMASS': 'Airmass',
-        # Add more mappings as needed
-    }
-
-    # Define the output columns in the desired order
-    output_columns = [
-        'JD', 'Magnitude', 'Uncertainty', 'HQuncertainty', 'Band', 'Observer Code', 
-        'Comment Code(s)', 'Comp Star 1', 'Comp Star 2', 'Charts', 'Comments', 
-        'Transformed', 'Airmass', 'Validation Flag', 'Cmag', 'Kmag', 'HJD', 
-        'Star Name', 'Observer Affiliation', 'Measurement Method', 
-        'Grouping Method', 'ADS Reference', 'Digitizer', 'Credit'
-    ]
+        cache (bool, optional): Whether the input may be read from, and stored in, the table caches, as in
+                                load_data. Defaults to None, which follows the global cache settings.
 
+    Returns:
+        str or None: The path of the output file, or None if the conversion failed.
+    """
     try:
-        # Determine the file extension
-        file_extension = os.path.splitext(input_file_path)[1].lower()
-        
-        # Read the data based on the file extension
-        if file_extension == '.csv':
-            data = pd.read_csv(input_file_path)
-        elif file_extension == '.tbl':
-            data = pd.read_csv(input_file_path, delimiter='\t')
-        elif file_extension in ['.xlsx', '.xls']:
-            data = pd.read_excel(input_file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-
-        # Rename columns based on the mapping
-        data.rename(columns=label_mapping, inplace=True)
-
-        # Add any columns not in the mapping and fill with NaN (for blank values)
-        for column in output_columns:
-            if column not in data.columns:
-                data[column] = pd.NA
-
-        # Set default values for specific columns
-        data['Band'] = band
-        data['Validation Flag'] = 'V'
-        data['Star Name'] = star_name
-
-        # Reorder columns to match the output columns
-        data = data[output_columns]
-
-        # Determine output file path
-        base_name, _ = os.path.splitext(input_file_path)
-        output_file_path = f"{base_name}_aavso_converted.txt"
-
-        # Save the transformed data to a text file
-        data.to_csv(output_file_path, sep='\t', index=False)
+        output_file_path = _aavso_output_path(input_file_path)
+        _aavso_convert(input_file_path, star_name, band, output_file_path, cache=cache)
 
         print(f"Success: Data has been transformed and saved to {output_file_path}")
+        return output_file_path
 
     except FileNotFoundError:
         print(f"Error: The file {input_file_path} was not found.")
@@ -163,10 +316,125 @@ def aavso_conv(input_file_path, star_name, band ='Vis.'):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
-    '''Example usage:
+    r'''Example usage:
     
     input_file_path = r"C:\Users\Zachary\Desktop\Observatory\v0865-lyr_master - Copy.xlsx"  # Adjust the path and format accordingl
     star_name = "V0865 lyr"
     aavso_conv(input_file_path, star_name)
     
-    '''
\ No newline at end of file
+    '''
+
+def aavso_bulk(inputs, star_name, band='Vis.', output=None, jobs=None, chunksize=DEFAULT_CHUNKSIZE, failures=None):
+    """
+    Convert many photometry files for AAVSO in parallel, optionally into a single submission file.
+
+    Only the mapped columns of each input are read. Without `output` every input is written next to itself
+    exactly like aavso_conv does; with `output` the converted tables are appended to one tab-separated file,
+    in input order, with a single header.
+
+    Parameters:
+        inputs (list): Input files and/or directories. Directories contribute their files of every format in
+                       lyra.readers, in name order. An item may also be a (path, star_name) tuple to override `star_name`.
+        star_name (str): The name of the target star used for every input without its own name.
+        band (str): The photometric band of the observations. Defaults to 'Vis.'.
+        output (str, optional): Single AAVSO file combining all inputs. Defaults to None (one file per input).
+        jobs (int, optional): Number of worker processes. None uses one worker per CPU. Defaults to None.
+        chunksize (int, optional): Number of rows written at a time. Defaults to DEFAULT_CHUNKSIZE.
+        failures (list, optional): If given, a FileFailure(path, star_name, error) record is appended for each
+                                   input that could not be converted instead of printing an error message.
+
+    Returns:
+        list: Paths written: the converted file of each successful input, or [output] when combining.
+    """
+    from .core import FileFailure, _imap_pool
+
+    files = _expand_inputs(inputs, star_name)
+    outputs = _bulk_output_paths([path for path, _ in files])
+    tasks = [(path, name, band, None if output else target, chunksize) for (path, name), target in zip(files, outputs)]
+    results = _imap_pool(_aavso_task, tasks, jobs)
+
+    written = []
+    handle = open(output, 'w', newline='') if output else None
+    try:
+        header = True
+        for (path, name, _, target, _), (frame, error) in zip(tasks, results):
+            if error is not None:
+                if failures is None:
+                    print(f"Error converting {path}: {error}")
+                else:
+                    failures.append(FileFailure(path, name, error))
+            elif handle is None:
+                written.append(target)
+            else:
+                _write_aavso(frame, handle, header, chunksize)
+                header = False
+    finally:
+        if handle is not None:
+            handle.close()
+            written.append(output)
+    return written
+
+def _aavso_convert(path, star_name, band, output_file_path=None, chunksize=DEFAULT_CHUNKSIZE, cache=None):
+    """
+    Convert one input file, reading only its mapped columns. With an output path the result is written there
+    and None returned; without one the converted DataFrame is returned.
+    """
+    data, _ = _load(path, cache=cache, columns=[col for col in AAVSO_LABEL_MAPPING if col != 'Band'])
+    frame = _aavso_frame(data, star_name, band)
+    if output_file_path is None:
+        return frame
+    with open(output_file_path, 'w', newline='') as handle:
+        _write_aavso(frame, handle, True, chunksize)
+
+def _aavso_task(task):
+    """Run _aavso_convert in a pool worker, returning (result, error) instead of raising."""
+    try:
+        return _aavso_convert(*task), None
+    except Exception as e:
+        return None, e
+
+def _aavso_frame(data, star_name, band):
+    """
+    Build the AAVSO table for a loaded DataFrame in a single DataFrame construction.
+    """
+    renamed = {AAVSO_LABEL_MAPPING[col]: data[col].to_numpy() for col in data.columns if col in AAVSO_LABEL_MAPPING}
+    defaults = {'Band': band, 'Validation Flag': 'V', 'Star Name': star_name}
+    columns = {col: defaults.get(col, renamed.get(col, pd.NA)) for col in AAVSO_COLUMNS}
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(data)), columns=AAVSO_COLUMNS)
+
+def _write_aavso(frame, handle, header, chunksize):
+    """Write `frame` tab-separated to an open file, `chunksize` rows at a time."""
+    if len(frame) == 0 and header:
+        frame.to_csv(handle, sep='\t', index=False)
+    for start in range(0, len(frame), chunksize):
+        frame.iloc[start:start + chunksize].to_csv(handle, sep='\t', index=False, header=header and start == 0)
+
+def _aavso_output_path(input_file_path):
+    base_name, _ = os.path.splitext(input_file_path)
+    return f"{base_name}_aavso_converted.txt"
+
+def _bulk_output_paths(paths):
+    """
+    Output path of each input of aavso_bulk. Inputs that would share one (e.g. 'a.csv' and 'a.tbl') keep
+    their extension in the name instead ('a_csv_aavso_converted.txt'), so no two workers write the same file.
+    """
+    outputs = [_aavso_output_path(path) for path in paths]
+    counts = Counter(os.path.abspath(output) for output in outputs)
+    return [output if counts[os.path.abspath(output)] == 1
+            else f"{os.path.splitext(path)[0]}_{os.path.splitext(path)[1].lstrip('.').lower()}_aavso_converted.txt"
+            for path, output in zip(paths, outputs)]
+
+def _expand_inputs(inputs, star_name):
+    """Expand directories and attach a star name to every input file; a file given twice is kept once."""
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    files = {}
+    for item in inputs:
+        path, name = item if isinstance(item, tuple) else (item, star_name)
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if os.path.splitext(entry)[1].lower() in READERS:
+                    files.setdefault(os.path.abspath(os.path.join(path, entry)), (os.path.join(path, entry), name))
+        else:
+            files.setdefault(os.path.abspath(path), (path, name))
+    return list(files.values())
@@ -0,0 +1,162 @@
+import warnings
+from collections import namedtuple
+import numpy as np
+
+# Result of ensemble_photometry: the comparison stars used, their normalised weights, the variability score of
+# every candidate (scatter over expected noise) and the candidates rejected as variable or noisy
+Ensemble = namedtuple('Ensemble', ['target', 'comparisons', 'weights', 'scores', 'rejected'])
+
+# AstroImageJ column prefixes of the sky-subtracted flux and its error for each aperture (T1, C2, C3, ...)
+FLUX_PREFIX = 'Source-Sky_'
+FLUX_ERR_PREFIX = 'Source_Error_'
+
+# Prefix of the differential magnitude columns written by ensemble_photometry; errors go to 'Diff_Mag_Err_<star>'
+MAG_PREFIX = 'Diff_Mag_'
+
+# 2.5 / ln(10): magnitude error of a relative flux error
+_MAG_PER_FLUX = 2.5 / np.log(10)
+
+def star_names(df):
+    """
+    Return the apertures (e.g. ['T1', 'C2', 'C3']) that have a 'Source-Sky_' flux column in `df`.
+    """
+    return [column[len(FLUX_PREFIX):] for column in df.columns if column.startswith(FLUX_PREFIX)]
+
+def ensemble_columns(star):
+    """Return the (magnitude, error) column names written by ensemble_photometry for `star`."""
+    return MAG_PREFIX + star, f'{MAG_PREFIX}Err_{star}'
+
+def ensemble_photometry(df, target='T1', comparisons=None, check=None, clip=2.0, min_comparisons=2, maxiter=5):
+    """
+    Differential photometry of a target against a weighted ensemble of comparison stars.
+
+    All stars are handled together as (rows, stars) matrices. Each candidate comparison star is measured
+    against the ensemble of all the others (a leave-one-out reference computed for every star at once). Its
+    variability score is the robust scatter of that light curve divided by the scatter expected from its
+    errors. Stars scoring more than `clip` times the median score are rejected, and the selection is repeated
+    until it settles. The reference magnitude of every row is the inverse-variance weighted mean of the kept
+    stars, using whichever stars have valid flux in that row. The differential magnitude of a kept comparison
+    star is taken against the ensemble without it, so check stars are never compared with themselves.
+
+    Parameters:
+    df (DataFrame): AstroImageJ table with 'Source-Sky_<star>' fluxes and, ideally, 'Source_Error_<star>'
+                    flux errors. Without error columns, Poisson errors sqrt(flux) are assumed.
+    target (str, optional): Target aperture. Default is 'T1'.
+    comparisons (list, optional): Candidate comparison apertures. Default is every 'C' aperture.
+    check (list, optional): Apertures to write differential magnitudes for besides the target. Default is
+                            every candidate comparison star.
+    clip (float, optional): Rejection threshold on the variability score, relative to the median score.
+                            Default is 2.0.
+    min_comparisons (int, optional): Least number of comparison stars kept. Default is 2.
+    maxiter (int, optional): Maximum number of selection rounds. Default is 5.
+
+    Returns:
+    tuple: (df, ensemble). df is a copy of the input with 'Diff_Mag_<star>' and 'Diff_Mag_Err_<star>' columns
+    for the target and check stars (see ensemble_columns); ensemble is an Ensemble describing the selection.
+
+    Raises:
+    KeyError: If the target or a requested star has no flux column.
+    ValueError: If there are fewer than `min_comparisons` candidate comparison stars.
+    """
+    stars = star_names(df)
+    if comparisons is None:
+        comparisons = [star for star in stars if star.startswith('C')]
+    comparisons = [star for star in comparisons if star != target]
+    check = comparisons if check is None else list(check)
+    for star in [target, *comparisons, *check]:
+        if star not in stars:
+            raise KeyError(f"Column '{FLUX_PREFIX}{star}' not found in DataFrame.")
+    if len(comparisons) < min_comparisons:
+        raise ValueError(f"At least {min_comparisons} comparison stars are needed, found {len(comparisons)}.")
+
+    mag, sigma = _magnitudes(df, [target, *comparisons])
+    target_mag, target_sigma = mag[:, 0], sigma[:, 0]
+    mag, sigma = mag[:, 1:], sigma[:, 1:]
+    valid = np.isfinite(mag) & np.isfinite(sigma)
+    # Each star relative to its own median, so that rows missing a star do not shift the reference
+    zero_points = _nanmedian(np.where(valid, mag, np.nan))
+    mag = mag - zero_points
+    mag, sigma = np.where(valid, mag, 0.0), np.where(valid, sigma, 0.0)
+
+    noise = _nanmedian(np.where(valid, sigma, np.nan))
+    used = np.ones(len(comparisons), dtype=bool)
+    weight = used / np.maximum(noise, 1e-6) ** 2
+    for _ in range(maxiter):
+        loo, _ = _leave_one_out(mag, sigma, valid, weight)
+        scatter = _robust_std(np.where(valid, mag - loo, np.nan))
+        score = scatter / np.maximum(noise, 1e-6)
+        keep = np.isfinite(score) & (score <= clip * np.median(score[used & np.isfinite(score)]))
+        if keep.sum() < min_comparisons:
+            keep = np.zeros_like(keep)
+            keep[np.argsort(np.where(np.isfinite(score), score, np.inf))[:min_comparisons]] = True
+        weight = keep / np.maximum(scatter, 1e-6) ** 2
+        if (keep == used).all():
+            break
+        used = keep
+
+    loo, loo_var = _leave_one_out(mag, sigma, valid, weight)
+    w = np.where(valid, weight, 0.0)
+    total = w.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        reference = np.where(total > 0, (w * mag).sum(axis=1) / total, np.nan)
+        reference_var = (w * w * sigma * sigma).sum(axis=1) / total ** 2
+    # Magnitude level of the ensemble, so that differential magnitudes are relative to the comparison stars
+    level = np.average(zero_points[used], weights=weight[used])
+
+    columns = {}
+    name, err_name = ensemble_columns(target)
+    columns[name] = target_mag - reference - level
+    columns[err_name] = np.sqrt(target_sigma ** 2 + reference_var)
+    # Kept comparison stars are measured against the ensemble without them, other stars against all of it
+    inner = [comparisons.index(star) for star in check if star in comparisons]
+    outer = [star for star in check if star not in comparisons]
+    diff = np.where(valid[:, inner], mag[:, inner] + zero_points[inner] - loo[:, inner] - level, np.nan)
+    diff_err = np.where(valid[:, inner], np.sqrt(sigma[:, inner] ** 2 + loo_var[:, inner]), np.nan)
+    if outer:
+        outer_mag, outer_sigma = _magnitudes(df, outer)
+        diff = np.hstack([diff, outer_mag - reference[:, None] - level])
+        diff_err = np.hstack([diff_err, np.sqrt(outer_sigma ** 2 + reference_var[:, None])])
+    for k, star in enumerate([comparisons[i] for i in inner] + outer):
+        name, err_name = ensemble_columns(star)
+        columns[name], columns[err_name] = diff[:, k], diff_err[:, k]
+
+    ensemble = Ensemble(target, [star for star, u in zip(comparisons, used) if u], weight[used] / weight[used].sum(),
+                        dict(zip(comparisons, score.tolist())), [star for star, u in zip(comparisons, used) if not u])
+    return df.assign(**columns), ensemble
+
+def _magnitudes(df, stars):
+    """Instrumental magnitudes and their errors of `stars` as (rows, stars) arrays; bad fluxes give NaN."""
+    flux = df[[FLUX_PREFIX + star for star in stars]].to_numpy(dtype=np.float64)
+    errors = [FLUX_ERR_PREFIX + star for star in stars]
+    if all(column in df.columns for column in errors):
+        flux_err = df[errors].to_numpy(dtype=np.float64)
+    else:
+        flux_err = np.sqrt(np.abs(flux))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flux = np.where(flux > 0, flux, np.nan)
+        return -2.5 * np.log10(flux), _MAG_PER_FLUX * flux_err / flux
+
+def _leave_one_out(mag, sigma, valid, weight):
+    """
+    Reference magnitude of every row without each star in turn, and its variance, as (rows, stars) arrays.
+    """
+    w = np.where(valid, weight, 0.0)
+    total = w.sum(axis=1, keepdims=True)
+    weighted = (w * mag).sum(axis=1, keepdims=True)
+    variance = (w * w * sigma * sigma).sum(axis=1, keepdims=True)
+    others = total - w
+    with np.errstate(invalid='ignore', divide='ignore'):
+        loo = np.where(others > 0, (weighted - w * mag) / others, np.nan)
+        loo_var = (variance - w * w * sigma * sigma) / others ** 2
+    return loo, loo_var
+
+def _robust_std(values):
+    """Scaled median absolute deviation of each column, ignoring NaN."""
+    centre = _nanmedian(values)
+    return 1.4826 * _nanmedian(np.abs(values - centre))
+
+def _nanmedian(values):
+    # Stars without a single valid row give NaN rather than a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(values, axis=0)
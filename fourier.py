@@ -0,0 +1,182 @@
+from collections import namedtuple
+import numpy as np
+from .lightcurve import LightCurve, dataset_arrays
+from .timing import Ephemeris, ephemeris_cycle, ephemeris_time
+
+# Fourier series fit of one folded dataset: mag(phase) = mean + sum_k a_k cos(2 pi k phase) + b_k sin(2 pi k phase).
+# `coefficients` holds (mean, a_1, b_1, a_2, b_2, ...); `amplitudes` and `phases` are the per-harmonic
+# A_k and phi_k of A_k cos(2 pi k phase + phi_k). `amplitude` is the peak-to-peak amplitude of the model,
+# `max_phase` the phase of maximum light (smallest magnitude) and `max_epoch` a BJD_TDB of maximum light when
+# the period is known. `rms` is the (weighted) root mean square of the residuals.
+FourierFit = namedtuple('FourierFit', ['label', 'order', 'mean', 'coefficients', 'amplitudes', 'phases',
+                                       'amplitude', 'max_phase', 'max_epoch', 'bic', 'rms', 'npoints'])
+
+# Phases at which models are evaluated to find their extrema and amplitude
+_GRID = 1000
+
+def fit_fourier(processed_data, max_order=8, min_order=1, mag_column='Source_AMag_T1', period=None):
+    """
+    Fit Fourier series to many folded datasets at once and pick the order of each by BIC.
+
+    Nothing is looped per dataset or per point: the weighted sums of cos(2 pi k phase) and sin(2 pi k phase)
+    for k up to 2 * max_order are accumulated for every dataset with np.bincount, and the normal matrices of
+    all datasets follow from them through product-to-sum identities. Every order is then one batched solve of
+    the leading block of those matrices, and its chi-square comes from the same sums, so the cost grows with the
+    number of points times the order and thousands of targets fit in one call.
+
+    Parameters:
+    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str),
+                           or of folded LightCurve objects. The phase must be in cycles (norm with div=True).
+    max_order (int, optional): Highest number of harmonics tried. Default is 8.
+    min_order (int, optional): Lowest number of harmonics tried. Default is 1.
+    mag_column (str, optional): Magnitude column of DataFrames; its error column gives 1/err**2 weights when
+                                present. Default is 'Source_AMag_T1'.
+    period (float or Ephemeris, optional): Period the tuples were folded with, used for max_epoch. LightCurves
+                                           carry their own. Default is None.
+
+    Returns:
+    list: One FourierFit per dataset, in the order of `processed_data`. Datasets with fewer points than the
+    lowest order needs get None.
+    """
+    if not 1 <= min_order <= max_order:
+        raise ValueError("Expected 1 <= min_order <= max_order.")
+
+    arrays = [dataset_arrays(item, mag_column) for item in processed_data]
+    if not arrays:
+        return []
+    phase = np.concatenate([p for p, _, _, _ in arrays])
+    mag = np.concatenate([m for _, m, _, _ in arrays])
+    dataset = np.repeat(np.arange(len(arrays)), [p.size for p, _, _, _ in arrays])
+    err = np.concatenate([np.full(p.size, np.nan) if e is None else e for p, _, e, _ in arrays])
+    weighted = np.array([e is not None for _, _, e, _ in arrays])
+    weight = np.where(weighted[dataset], err ** -2.0, 1.0)
+
+    good = np.isfinite(phase) & np.isfinite(mag) & np.isfinite(weight) & (weight > 0)
+    phase, mag, weight, dataset = phase[good], mag[good], weight[good], dataset[good]
+    n_sets = len(arrays)
+    count = np.bincount(dataset, minlength=n_sets)
+
+    # Centre every dataset on its weighted mean so that the chi-square from the sums keeps its precision
+    total = np.bincount(dataset, weights=weight, minlength=n_sets)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centre = np.bincount(dataset, weights=weight * mag, minlength=n_sets) / total
+    y = mag - centre[dataset]
+
+    # Weighted harmonic sums: C[:, k] = sum w cos(2 pi k phase), S likewise, for k = 0 .. 2 * max_order
+    angle = 2.0 * np.pi * phase
+    C = np.empty((n_sets, 2 * max_order + 1))
+    S = np.empty((n_sets, 2 * max_order + 1))
+    YC = np.empty((n_sets, max_order + 1))
+    YS = np.empty((n_sets, max_order + 1))
+    for k in range(2 * max_order + 1):
+        cos, sin = np.cos(k * angle), np.sin(k * angle)
+        C[:, k] = np.bincount(dataset, weights=weight * cos, minlength=n_sets)
+        S[:, k] = np.bincount(dataset, weights=weight * sin, minlength=n_sets)
+        if k <= max_order:
+            YC[:, k] = np.bincount(dataset, weights=weight * y * cos, minlength=n_sets)
+            YS[:, k] = np.bincount(dataset, weights=weight * y * sin, minlength=n_sets)
+    yy = np.bincount(dataset, weights=weight * y * y, minlength=n_sets)
+
+    normal, rhs = _normal_equations(C, S, YC, YS, max_order)
+
+    best_bic = np.full(n_sets, np.inf)
+    best_order = np.zeros(n_sets, dtype=int)
+    best_coef = np.zeros((n_sets, 2 * max_order + 1))
+    best_chi2 = np.full(n_sets, np.nan)
+    for order in range(min_order, max_order + 1):
+        size = 2 * order + 1
+        coef = np.einsum('dij,dj->di', np.linalg.pinv(normal[:, :size, :size]), rhs[:, :size])
+        chi2 = np.maximum(yy - np.einsum('di,di->d', coef, rhs[:, :size]), 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fit_term = np.where(weighted, chi2, count * np.log(chi2 / count))
+            bic = fit_term + size * np.log(count)
+        better = (count > size + 1) & (bic < best_bic)
+        best_bic[better] = bic[better]
+        best_order[better] = order
+        best_chi2[better] = chi2[better]
+        best_coef[better] = 0.0
+        best_coef[better, :size] = coef[better]
+
+    grid = np.arange(_GRID) / _GRID
+    model = best_coef @ _basis(grid, max_order).T
+    brightest = np.argmin(model, axis=1)
+    amplitude = model.max(axis=1) - model.min(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rms = np.sqrt(best_chi2 / total)
+
+    fits = []
+    for d, (item, (_, _, _, label)) in enumerate(zip(processed_data, arrays)):
+        order = best_order[d]
+        if order == 0:
+            fits.append(None)
+            continue
+        coef = best_coef[d, :2 * order + 1].copy()
+        coef[0] += centre[d]
+        a, b = coef[1::2], coef[2::2]
+        max_phase = grid[brightest[d]]
+        item_period = item.period if isinstance(item, LightCurve) else period
+        fits.append(FourierFit(label, int(order), float(coef[0]), coef, np.hypot(a, b), np.arctan2(-b, a),
+                               float(amplitude[d]), float(max_phase), _max_epoch(item, item_period, max_phase),
+                               float(best_bic[d]), float(rms[d]), int(count[d])))
+    return fits
+
+def fourier_model(fit, phase):
+    """
+    Evaluate a FourierFit at the given phases (in cycles).
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    return _basis(phase, fit.order) @ fit.coefficients
+
+def _basis(phase, order):
+    """Design matrix with columns 1, cos(2 pi phase), sin(2 pi phase), cos(4 pi phase), ..."""
+    angle = 2.0 * np.pi * np.multiply.outer(phase, np.arange(1, order + 1))
+    basis = np.empty(phase.shape + (2 * order + 1,))
+    basis[..., 0] = 1.0
+    basis[..., 1::2] = np.cos(angle)
+    basis[..., 2::2] = np.sin(angle)
+    return basis
+
+def _normal_equations(C, S, YC, YS, order):
+    """
+    Assemble the normal matrices and right-hand sides of every dataset from the harmonic sums, with
+    cos a cos b = (cos(a-b) + cos(a+b)) / 2 and the like.
+    """
+    size = 2 * order + 1
+    harmonic = np.concatenate(([0], np.repeat(np.arange(1, order + 1), 2)))
+    is_sin = np.arange(size) % 2 == 0
+    is_sin[0] = False
+
+    diff = harmonic[:, None] - harmonic[None, :]
+    plus = harmonic[:, None] + harmonic[None, :]
+    c_diff, c_plus = C[:, np.abs(diff)], C[:, plus]
+    s_diff, s_plus = np.sign(diff) * S[:, np.abs(diff)], S[:, plus]
+
+    row_sin, col_sin = is_sin[:, None], is_sin[None, :]
+    normal = np.where(~row_sin & ~col_sin, 0.5 * (c_diff + c_plus),
+             np.where(row_sin & col_sin, 0.5 * (c_diff - c_plus),
+             np.where(~row_sin & col_sin, 0.5 * (s_plus - s_diff), 0.5 * (s_plus + s_diff))))
+
+    rhs = np.empty((C.shape[0], size))
+    rhs[:, 0] = YC[:, 0]
+    rhs[:, 1::2] = YC[:, 1:]
+    rhs[:, 2::2] = YS[:, 1:]
+    return normal, rhs
+
+def _max_epoch(item, period, max_phase):
+    """BJD_TDB of the first maximum of light after the start of a dataset, or None without a period."""
+    if period is None or isinstance(period, str):
+        return None
+    if isinstance(item, LightCurve):
+        start = item.time.min() if len(item) else None
+    else:
+        df = item[0]
+        start = df['BJD_TDB'].min() if 'BJD_TDB' in df.columns and len(df) else None
+    if start is None:
+        return None
+    if not isinstance(period, Ephemeris):
+        period = Ephemeris(0.0, period)
+    cycle = np.floor(ephemeris_cycle(start, period))
+    epoch = ephemeris_time(cycle + max_phase, period)
+    if epoch < start:
+        epoch = ephemeris_time(cycle + 1 + max_phase, period)
+    return float(epoch)
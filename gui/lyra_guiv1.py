@@ -1,8 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
+import queue
+import threading
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from lyra.binning import reduce_points
 from lyra.core import process_dfs
-from lyra.plot import plot_lightcurve
+from lyra.render import draw_lightcurve
+
+# The period slider spans this fraction of the period on either side of the entered value
+SLIDER_SPAN = 0.05
+
+# Milliseconds between checks of the loading thread's messages
+POLL_INTERVAL = 100
 
 class LyraGUI:
     def __init__(self, root):
@@ -23,12 +34,34 @@ class LyraGUI:
         self.xlim_var = tk.StringVar(value="(0.0, 1.0)")
         self.grid_var = tk.BooleanVar(value=True)
         self.error_bars_var = tk.BooleanVar(value=False)
+        self.bins_var = tk.StringVar(value="")
+        self.bin_stat_var = tk.StringVar(value="mean")
+        self.max_points_var = tk.StringVar(value="")
 
         self.period_var = tk.DoubleVar()
         self.clean_var = tk.BooleanVar(value=False)
 
         self.label_header_added = False  # Flag to track if label header has been added
 
+        # Parsed datasets kept between plots: (file path, clean) -> ((mtime, size), LightCurve)
+        self.datasets = {}
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+
+        # Plot window, its curves and their line artists, reused while the window is open
+        self.plot_window = None
+        self.figure = None
+        self.canvas = None
+        self.slider = None
+        self.slider_label = None
+        self.curves = []
+        self.lines = []
+        self.plot_options = {}
+        self.figsize = (10, 6)
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.status_var = tk.StringVar(value="")
+
         # Create widgets
         label_files = ttk.Label(self.root, text="Files (comma-separated):")
         self.entry_files = ttk.Entry(self.root, width=50)
@@ -61,7 +94,19 @@ class LyraGUI:
 
         check_error_bars = ttk.Checkbutton(self.root, text="Error Bars", variable=self.error_bars_var)
 
-        button_plot = ttk.Button(self.root, text="Plot", command=self.plot)
+        label_bins = ttk.Label(self.root, text="Phase bins:")
+        entry_bins = ttk.Entry(self.root, textvariable=self.bins_var)
+
+        label_bin_stat = ttk.Label(self.root, text="Bin stat:")
+        combo_bin_stat = ttk.Combobox(self.root, textvariable=self.bin_stat_var, values=("mean", "median"), state="readonly")
+
+        label_max_points = ttk.Label(self.root, text="Max points:")
+        entry_max_points = ttk.Entry(self.root, textvariable=self.max_points_var)
+
+        self.button_plot = ttk.Button(self.root, text="Plot", command=self.plot)
+        self.button_cancel = ttk.Button(self.root, text="Cancel", command=self.cancel, state="disabled")
+        progress = ttk.Progressbar(self.root, variable=self.progress_var, maximum=1.0)
+        label_status = ttk.Label(self.root, textvariable=self.status_var)
 
         # Layout widgets using grid
         label_files.grid(row=0, column=0, padx=5, pady=5, sticky="w")
@@ -76,6 +121,15 @@ class LyraGUI:
         label_title.grid(row=3, column=0, padx=5, pady=5, sticky="w")
         entry_title.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
 
+        label_bins.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        entry_bins.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+
+        label_bin_stat.grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        combo_bin_stat.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+
+        label_max_points.grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        entry_max_points.grid(row=6, column=1, padx=5, pady=5, sticky="ew")
+
         label_figsize.grid(row=0, column=3, padx=5, pady=5, sticky="w")
         entry_figsize.grid(row=0, column=4, padx=5, pady=5, sticky="ew")
 
@@ -94,7 +148,10 @@ class LyraGUI:
 
         check_error_bars.grid(row=6, column=4, padx=5, pady=5, sticky="w")
 
-        button_plot.grid(row=7, column=4, padx=5, pady=10, sticky="se")  # Place button in bottom right corner
+        progress.grid(row=7, column=0, columnspan=2, padx=5, pady=10, sticky="ew")
+        label_status.grid(row=8, column=0, columnspan=2, padx=5, pady=2, sticky="w")
+        self.button_cancel.grid(row=7, column=3, padx=5, pady=10, sticky="se")
+        self.button_plot.grid(row=7, column=4, padx=5, pady=10, sticky="se")  # Place button in bottom right corner
 
         # Resize behavior
         self.root.columnconfigure(1, weight=1)
@@ -175,12 +232,183 @@ class LyraGUI:
         xlim = eval(self.xlim_var.get())
         grid = self.grid_var.get()
         error_bars = self.error_bars_var.get()
+        try:
+            bins = int(self.bins_var.get()) if self.bins_var.get().strip() else None
+            max_points = int(self.max_points_var.get()) if self.max_points_var.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Error", "Phase bins and max points must be whole numbers.")
+            return
+        bin_stat = self.bin_stat_var.get()
+
+        self.plot_options = {'invert_yaxis': invert_yaxis, 'ylabel': ylabel, 'xlabel': xlabel, 'title': title,
+                             'xlim': xlim, 'grid': grid, 'error_bars': error_bars, 'bins': bins,
+                             'bin_stat': bin_stat, 'max_points': max_points}
+        self.figsize = figsize
+
+        if not dataframes or (self.worker is not None and self.worker.is_alive()):
+            return
+
+        # Only files that are new or changed on disk are parsed; the rest are refolded from memory
+        pending = [(file_path, label) for file_path, label in dataframes
+                   if self._cached(file_path, clean) is None]
+        if not pending:
+            self.show(dataframes, period, clean)
+            return
+
+        self.cancel_event.clear()
+        self.progress_var.set(0.0)
+        self.button_plot.config(state="disabled")
+        self.button_cancel.config(state="normal")
+        self.worker = threading.Thread(target=self._load_files, args=(pending, clean), daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL, self._poll, dataframes, period, clean)
+
+    def cancel(self):
+        # The file being parsed is finished; the remaining ones are skipped
+        self.cancel_event.set()
+        self.status_var.set("Cancelling...")
+
+    def _cached(self, file_path, clean):
+        entry = self.datasets.get((file_path, clean))
+        if entry is None:
+            return None
+        signature, curve = entry
+        return curve if signature == _signature(file_path) else None
+
+    def _load_files(self, pending, clean):
+        """
+        Parse `pending` (file path, label) pairs into LightCurves. Runs in the worker thread, so it only talks
+        to the Tk thread through self.messages.
+        """
+        for index, (file_path, label) in enumerate(pending):
+            if self.cancel_event.is_set():
+                self.messages.put(('cancelled', None))
+                return
+            self.messages.put(('progress', (index, len(pending), file_path)))
+            failures = []
+            signature = _signature(file_path)
+            curves = process_dfs([(file_path, label)], None, clean=clean, failures=failures, lightcurves=True)
+            if failures:
+                self.messages.put(('error', f"{file_path}: {failures[0].error}"))
+            else:
+                self.messages.put(('loaded', (file_path, clean, signature, curves[0])))
+        self.messages.put(('done', len(pending)))
+
+    def _poll(self, dataframes, period, clean):
+        errors = []
+        finished = None
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                index, total, file_path = payload
+                self.progress_var.set(index / total)
+                self.status_var.set(f"Loading {os.path.basename(file_path)} ({index + 1}/{total})")
+            elif kind == 'loaded':
+                file_path, clean_key, signature, curve = payload
+                self.datasets[(file_path, clean_key)] = (signature, curve)
+            elif kind == 'error':
+                errors.append(payload)
+            else:
+                finished = kind
+
+        if errors:
+            messagebox.showerror("Error", "\n".join(errors))
+        if finished is None:
+            self.root.after(POLL_INTERVAL, self._poll, dataframes, period, clean)
+            return
+
+        self.button_plot.config(state="normal")
+        self.button_cancel.config(state="disabled")
+        self.progress_var.set(1.0 if finished == 'done' else 0.0)
+        self.status_var.set("Loaded." if finished == 'done' else "Cancelled.")
+        if finished == 'done':
+            self.show(dataframes, period, clean)
+
+    def show(self, dataframes, period, clean):
+        """
+        Fold the in-memory datasets with `period` and draw them in the plot window, reusing it if it is open.
+        """
+        self.curves = []
+        for file_path, label in dataframes:
+            curve = self._cached(file_path, clean)
+            if curve is not None:
+                curve.label = label
+                self.curves.append(curve.fold(period))
+        if not self.curves:
+            return
+
+        if self.plot_window is None or not self.plot_window.winfo_exists():
+            self._open_plot_window()
+        self.figure.set_size_inches(self.figsize)
+        low, high = period * (1 - SLIDER_SPAN), period * (1 + SLIDER_SPAN)
+        self.slider.config(from_=low, to=high)
+        self.slider.set(period)
+        self._redraw()
+
+    def _open_plot_window(self):
+        self.plot_window = tk.Toplevel(self.root)
+        self.plot_window.title("Lyra Plot")
+        self.figure = Figure(figsize=self.figsize)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.plot_window)
+        NavigationToolbar2Tk(self.canvas, self.plot_window).update()
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        frame = ttk.Frame(self.plot_window)
+        ttk.Label(frame, text="Period:").pack(side=tk.LEFT, padx=5)
+        self.slider = ttk.Scale(frame, orient=tk.HORIZONTAL, command=self._slide)
+        self.slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.slider_label = ttk.Label(frame, width=12)
+        self.slider_label.pack(side=tk.LEFT, padx=5)
+        frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+
+    def _redraw(self):
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        try:
+            draw_lightcurve(ax, self.curves, **self.plot_options)
+        except (ValueError, KeyError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        # One line per dataset unless error bars are drawn; those are rebuilt on every change instead
+        self.lines = [] if self.plot_options['error_bars'] else list(ax.lines)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def _slide(self, value):
+        period = float(value)
+        self.period_var.set(round(period, 8))
+        self.slider_label.config(text=f"{period:.6f}")
+        if not self.curves or self.curves[0].period == period:
+            return
+        for curve in self.curves:
+            curve.fold(period)
+        if not self.lines:
+            self._redraw()
+            return
 
-        if dataframes:
-            processed_data = process_dfs(dataframes, period, clean=clean)
-            plot_lightcurve(processed_data, figsize=figsize, invert_yaxis=invert_yaxis,
-                            ylabel=ylabel, xlabel=xlabel, title=title,
-                            xlim=xlim, grid=grid, error_bars=error_bars)
+        # Refold in place: only the line data changes, the figure and axes are kept
+        options = self.plot_options
+        for curve, line in zip(self.curves, self.lines):
+            phase, mag, _ = reduce_points(curve.phase, curve.mag, curve.err, bins=options['bins'],
+                                          bin_stat=options['bin_stat'], max_points=options['max_points'],
+                                          xlim=options['xlim'])
+            line.set_data(phase, mag)
+        if options['bins']:
+            ax = self.lines[0].axes
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+        self.canvas.draw_idle()
+
+def _signature(file_path):
+    """Modification time and size of a file, or None if it cannot be read."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 if __name__ == "__main__":
     root = tk.Tk()
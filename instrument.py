@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Stage records are emitted on this logger, one JSON object per message
+logger = logging.getLogger('lyra.profile')
+
+# Number of stage records kept for profile_records; older ones are dropped, so long-running commands
+# (lyra serve, lyra watch) do not grow without bound. The logger still receives every record.
+MAX_RECORDS = 10_000
+
+_state = {
+    'enabled': bool(os.environ.get('LYRA_PROFILE')),
+    'memory': os.environ.get('LYRA_PROFILE') != 'nomemory',
+    'records': deque(maxlen=MAX_RECORDS),
+}
+
+# Stages currently open in each thread, innermost last
+_local = threading.local()
+
+# Stages measuring memory, in every thread, and the lock guarding them. tracemalloc's peak is process-wide,
+# so a stage that overlaps a stage of another thread cannot tell its own peak from the other one's.
+_memory_stages = {}
+_memory_lock = threading.Lock()
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+class _NullStage:
+    """Stand-in returned by stage() while profiling is off; every operation is a no-op."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+if _state['enabled'] and _state['memory'] and not tracemalloc.is_tracing():
+    # Worker process started with profiling already requested by its parent
+    tracemalloc.start()
+
+class _Stage:
+    """Context manager measuring one pipeline stage; see stage()."""
+    __slots__ = ('fields', 'start', 'base', 'peak', 'shared')
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.peak = 0
+        self.shared = False
+
+    def __enter__(self):
+        if _state['memory'] and tracemalloc.is_tracing():
+            thread = threading.get_ident()
+            with _memory_lock:
+                others = [s for s, owner in _memory_stages.items() if owner != thread]
+                if others:
+                    # Running alongside another thread's stage: neither can measure its own peak
+                    self.shared = True
+                    for other in others:
+                        other.shared = True
+                else:
+                    tracemalloc.reset_peak()
+                self.base = tracemalloc.get_traced_memory()[0]
+                _memory_stages[self] = thread
+        else:
+            self.base = None
+        _stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **fields):
+        """Record fields only known inside the stage, such as rows_out."""
+        self.fields.update(fields)
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _stack().pop()
+
+        record = dict(self.fields, seconds=round(seconds, 6))
+        if self.base is not None:
+            with _memory_lock:
+                _memory_stages.pop(self, None)
+                peak = max(tracemalloc.get_traced_memory()[1], self.peak)
+            record['peak_bytes'] = None if self.shared else peak - self.base
+            # The peak counter was reset for this stage; hand the absolute peak to the enclosing one
+            if _stack():
+                parent = _stack()[-1]
+                parent.peak = max(parent.peak, peak)
+        if exc_type is not None:
+            record['error'] = repr(exc)
+
+        _state['records'].append(record)
+        logger.info(json.dumps(record, default=str))
+        return False
+
+def stage(name, file=None, **fields):
+    """
+    Measure a pipeline stage when profiling is enabled.
+
+    Used as a context manager around parsing, cleaning, folding and rendering. It records the wall time and,
+    if memory profiling is on, the peak memory allocated during the stage, together with any fields passed
+    here or later through .set() (rows_in, rows_out, bytes_read, ...). tracemalloc's peak is process-wide, so
+    the peak is recorded as None for a stage that overlapped a stage of another thread (server workers,
+    thread pools). While profiling is off it returns a shared no-op object, so the cost is one function call.
+
+    Parameters:
+    name (str): Stage name, e.g. 'parse' or 'fold'.
+    file (str, optional): File or dataset the stage works on.
+    **fields: Extra fields to record.
+
+    Returns:
+    context manager: Object with a set(**fields) method.
+    """
+    if not _state['enabled']:
+        return _NULL_STAGE
+    fields['stage'] = name
+    if file is not None:
+        fields['file'] = str(file)
+    fields['pid'] = os.getpid()
+    return _Stage(fields)
+
+def enable_profiling(memory=True, output=None):
+    """
+    Turn on stage profiling.
+
+    Records are kept in memory (see profile_records) and logged as JSON on the 'lyra.profile' logger. The
+    setting is also exported through the LYRA_PROFILE environment variable so that worker processes started
+    afterwards profile too; forked workers log through the same handlers.
+
+    Parameters:
+    memory (bool, optional): Also measure peak memory per stage with tracemalloc, which slows Python code
+                             noticeably. Default is True.
+    output (str, optional): Write the JSON records to this file (one per line); '-' writes them to stderr.
+                            Default is None, which leaves logging configuration to the caller.
+    """
+    _state['enabled'] = True
+    _state['memory'] = memory
+    os.environ['LYRA_PROFILE'] = '1' if memory else 'nomemory'
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    if output is not None:
+        handler = logging.StreamHandler() if output == '-' else logging.FileHandler(output, mode='a')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+def disable_profiling():
+    """Turn off stage profiling and stop memory tracing."""
+    _state['enabled'] = False
+    os.environ.pop('LYRA_PROFILE', None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def profile_records(clear=False):
+    """
+    Return the stage records collected in this process; only the last MAX_RECORDS are kept.
+
+    Parameters:
+    clear (bool, optional): Also forget the records. Default is False.
+
+    Returns:
+    list: One dict per finished stage, in completion order.
+    """
+    records = list(_state['records'])
+    if clear:
+        _state['records'].clear()
+    return records
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from .data import error_column
+from .timing import Ephemeris, ephemeris_phase
+
+# Number of folds kept per LightCurve, so that scanning many periods does not grow memory without bound
+PHASE_CACHE_SIZE = 4
+
+class LightCurve:
+    """
+    Compact light curve: contiguous float64 arrays of time, magnitude and error plus a label.
+
+    A LightCurve replaces the (DataFrame, first, last, label) tuples of process_dfs where memory matters: it
+    keeps only the three photometry columns and never modifies the table it was built from. The phase is
+    computed on first access for the current period and cached, so refolding with an earlier period is free.
+
+    Parameters:
+    time (array): Observation times (BJD_TDB).
+    mag (array): Magnitudes (Source_AMag_T1).
+    err (array, optional): Magnitude uncertainties (Source_AMag_Err_T1).
+    label (str, optional): Label of the dataset. Default is ''.
+    period (float or Ephemeris, optional): Period used for .phase, or an ephemeris (see lyra.timing).
+                                           Default is None (not folded).
+    div (bool, optional): Whether the phase is divided by the period, as in norm. Default is True.
+    source (str, optional): File the data came from.
+    meta (dict, optional): Any other metadata.
+    mag_column (str, optional): Column `mag` was read from, used again by to_frame (e.g. 'Diff_Mag_T1' after
+                                ensemble photometry). Default is 'Source_AMag_T1'.
+    """
+    __slots__ = ('time', 'mag', 'err', 'label', 'period', 'div', 'source', 'meta', 'mag_column', '_phases')
+
+    def __init__(self, time, mag, err=None, label='', period=None, div=True, source=None, meta=None,
+                 mag_column='Source_AMag_T1'):
+        self.time = np.ascontiguousarray(time, dtype=np.float64)
+        self.mag = np.ascontiguousarray(mag, dtype=np.float64)
+        self.err = None if err is None else np.ascontiguousarray(err, dtype=np.float64)
+        if self.mag.shape != self.time.shape or (self.err is not None and self.err.shape != self.time.shape):
+            raise ValueError("time, mag and err must have the same length.")
+        self.label = label
+        self.period = period
+        self.div = div
+        self.source = source
+        self.meta = meta if meta is not None else {}
+        self.mag_column = mag_column
+        self._phases = {}
+
+    @classmethod
+    def from_frame(cls, df, label='', period=None, div=True, source=None, time_column='BJD_TDB',
+                   mag_column='Source_AMag_T1', err_column=None):
+        """
+        Build a LightCurve from the photometry columns of an AstroImageJ DataFrame, which is left untouched.
+        The error column is optional and defaults to the one of `mag_column` (see lyra.data.error_column).
+        """
+        err_column = error_column(mag_column) if err_column is None else err_column
+        for column in (time_column, mag_column):
+            if column not in df.columns:
+                raise KeyError(f"Column '{column}' not found in DataFrame.")
+        err = df[err_column].to_numpy(dtype=np.float64) if err_column in df.columns else None
+        return cls(df[time_column].to_numpy(dtype=np.float64), df[mag_column].to_numpy(dtype=np.float64), err,
+                   label=label, period=period, div=div, source=source, mag_column=mag_column)
+
+    @classmethod
+    def from_processed(cls, item):
+        """Build a LightCurve from a (DataFrame, first, last, label) tuple returned by process_dfs."""
+        df, _, _, label = item
+        lc = cls.from_frame(df, label)
+        if 'BJD_normalized' in df.columns:
+            lc._phases[None] = df['BJD_normalized'].to_numpy(dtype=np.float64)
+        return lc
+
+    def fold(self, period, div=True):
+        """
+        Set the period used by .phase and return self. Nothing is computed until .phase is read.
+        """
+        self.period = period
+        self.div = div
+        return self
+
+    def folded(self, period, div=True):
+        """
+        Return a new LightCurve sharing this one's arrays (no copy), folded with `period`.
+        """
+        return LightCurve(self.time, self.mag, self.err, self.label, period, div, self.source, self.meta,
+                          self.mag_column)
+
+    @property
+    def phase(self):
+        """Phase of each point for the current period, as norm computes BJD_normalized."""
+        key = (self.period, self.div) if self.period is not None else None
+        phase = self._phases.get(key)
+        if phase is None:
+            if self.period is None:
+                raise ValueError("LightCurve has no period; call fold(period) first.")
+            if isinstance(self.period, Ephemeris):
+                phase = ephemeris_phase(self.time, self.period, self.div)
+            else:
+                phase = self.time % self.period
+                if self.div:
+                    phase /= self.period
+            if len(self._phases) >= PHASE_CACHE_SIZE:
+                self._phases.pop(next(iter(self._phases)))
+            self._phases[key] = phase
+        return phase
+
+    @property
+    def first(self):
+        """First phase value, as returned by norm."""
+        return self.phase[0] if len(self) else None
+
+    @property
+    def last(self):
+        """Last phase value, as returned by norm."""
+        return self.phase[-1] if len(self) else None
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays, cached phases included."""
+        arrays = [self.time, self.mag] + ([self.err] if self.err is not None else []) + list(self._phases.values())
+        return sum(array.nbytes for array in arrays)
+
+    def to_frame(self):
+        """
+        Return the data as a DataFrame with the AstroImageJ column names (plus BJD_normalized if folded). The
+        magnitudes are named after mag_column and the errors after its error column.
+        """
+        columns = {'BJD_TDB': self.time, self.mag_column: self.mag}
+        if self.err is not None:
+            columns[error_column(self.mag_column)] = self.err
+        if self.period is not None:
+            columns['BJD_normalized'] = self.phase
+        return pd.DataFrame(columns)
+
+    def __len__(self):
+        return self.time.size
+
+    def __repr__(self):
+        return f"LightCurve(label={self.label!r}, points={len(self)}, period={self.period!r})"
+
+def dataset_arrays(item, mag_column='Source_AMag_T1', err_column=None):
+    """
+    Return (phase, mag, err, label) of a LightCurve or of a (DataFrame, first, last, label) tuple.
+
+    err is None when the dataset has no uncertainties. For tuples, `mag_column` and `err_column` select the
+    columns used; err_column defaults to the error column of `mag_column` (see lyra.data.error_column).
+    """
+    err_column = error_column(mag_column) if err_column is None else err_column
+    if isinstance(item, LightCurve):
+        return item.phase, item.mag, item.err, item.label
+
+    df, _, _, label = item
+    if mag_column not in df.columns:
+        raise ValueError(f"Missing '{mag_column}' column in DataFrame.")
+    err = df[err_column].to_numpy(dtype=np.float64) if err_column in df.columns else None
+    return (df['BJD_normalized'].to_numpy(dtype=np.float64), df[mag_column].to_numpy(dtype=np.float64),
+            err, label)
@@ -0,0 +1,201 @@
+from collections import namedtuple
+import numpy as np
+from .core import _run_pool
+from .data import AIJ_COLUMNS, _load, error_column
+from .lightcurve import LightCurve
+
+# Result of a period search. `power` is larger for better periods for every method.
+Periodogram = namedtuple('Periodogram', ['frequency', 'power', 'best_periods', 'best_powers', 'method'])
+
+METHODS = ('ls', 'pdm')
+
+# Upper bound on the number of (frequency, point) cells evaluated at once per chunk
+_CHUNK_CELLS = 2_000_000
+
+def period_search(time, mag, err=None, method='ls', min_period=0.05, max_period=None, oversample=5,
+                  n_peaks=5, nbins=10, jobs=1):
+    """
+    Compute a periodogram of a light curve over a regular frequency grid.
+
+    The grid is evaluated in chunks of frequencies, each chunk as a handful of NumPy matrix operations over
+    all points at once. Large grids can be spread over several worker processes.
+
+    Parameters:
+    time (array): Observation times (e.g. BJD_TDB) in days.
+    mag (array): Magnitudes (e.g. Source_AMag_T1).
+    err (array, optional): Magnitude uncertainties, used as 1/err**2 weights by the 'ls' method.
+    method (str, optional): 'ls' for the generalised (floating-mean) Lomb-Scargle periodogram or 'pdm' for
+                            phase dispersion minimisation. Default is 'ls'.
+    min_period (float, optional): Shortest period searched, in days. Default is 0.05.
+    max_period (float, optional): Longest period searched, in days. Default is the time baseline.
+    oversample (int, optional): Number of grid points per natural peak width 1/baseline. Default is 5.
+    n_peaks (int, optional): Number of best periods returned. Default is 5.
+    nbins (int, optional): Number of phase bins used by 'pdm'. Default is 10.
+    jobs (int, optional): Number of worker processes the frequency chunks are spread over. 1 runs serially,
+                          None uses one worker per CPU. Default is 1.
+
+    Returns:
+    Periodogram: Named tuple (frequency, power, best_periods, best_powers, method). For 'pdm' the power is
+    1 - theta, so that larger is better as for 'ls'.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Supported methods are {', '.join(METHODS)}.")
+
+    time = np.asarray(time, dtype=np.float64)
+    mag = np.asarray(mag, dtype=np.float64)
+    err = None if err is None else np.asarray(err, dtype=np.float64)
+
+    good = np.isfinite(time) & np.isfinite(mag)
+    if err is not None:
+        good &= np.isfinite(err) & (err > 0)
+    time, mag = time[good], mag[good]
+    err = None if err is None else err[good]
+    if time.size < 3:
+        raise ValueError("At least three finite points are needed for a period search.")
+
+    # Work relative to the first observation so that omega * t keeps its precision
+    time = time - time.min()
+    frequency = frequency_grid(time, min_period, max_period, oversample)
+
+    weights = np.ones_like(mag) if err is None else 1.0 / err ** 2
+    weights = weights / weights.sum()
+
+    chunk = max(1, _CHUNK_CELLS // time.size)
+    tasks = [(method, time, mag, weights, frequency[i:i + chunk], nbins)
+             for i in range(0, frequency.size, chunk)]
+    if jobs == 1 or len(tasks) < 2:
+        power = [_power_chunk(task) for task in tasks]
+    else:
+        power = _run_pool(_power_chunk, tasks, jobs)
+    power = np.concatenate(power)
+
+    peaks = _best_peaks(power, n_peaks)
+    return Periodogram(frequency, power, 1.0 / frequency[peaks], power[peaks], method)
+
+def frequency_grid(time, min_period=0.05, max_period=None, oversample=5):
+    """
+    Build a regular frequency grid (cycles per day) for the times in `time`.
+
+    Returns:
+    ndarray: Frequencies from 1/max_period to 1/min_period spaced by 1/(oversample * baseline).
+    """
+    baseline = np.ptp(time)
+    if baseline <= 0:
+        raise ValueError("The observations must span a non-zero time baseline.")
+    if max_period is None:
+        max_period = baseline
+    if not 0 < min_period < max_period:
+        raise ValueError("Expected 0 < min_period < max_period.")
+
+    step = 1.0 / (oversample * baseline)
+    return np.arange(1.0 / max_period, 1.0 / min_period + step, step)
+
+def find_period(dataframes, clean=False, **kwargs):
+    """
+    Load the AIJ_COLUMNS of each file and run period_search on all of them together.
+
+    Parameters:
+    dataframes (list): List of tuples where each tuple contains (filename, label).
+    clean (bool, optional): Whether to perform data cleaning on the loaded DataFrames. Default is False.
+    **kwargs: Passed on to period_search.
+
+    Returns:
+    Periodogram: The periodogram of the combined BJD_TDB / Source_AMag_T1 series.
+    """
+    frames = [_load(name_str, clean=clean, columns=AIJ_COLUMNS)[0] for name_str, _ in dataframes]
+    return search_frames(frames, **kwargs)
+
+def search_frames(frames, mag_column='Source_AMag_T1', **kwargs):
+    """
+    Run period_search on the concatenated BJD_TDB / Source_AMag_T1 (/ Source_AMag_Err_T1) columns of `frames`,
+    which may be DataFrames or LightCurve objects. `mag_column` selects another magnitude column of DataFrames,
+    used with its error column.
+    """
+    err_column = error_column(mag_column)
+    if not frames:
+        raise ValueError("No data to search.")
+
+    series = []
+    for frame in frames:
+        if isinstance(frame, LightCurve):
+            series.append((frame.time, frame.mag, frame.err))
+            continue
+        for column in ('BJD_TDB', mag_column):
+            if column not in frame.columns:
+                raise KeyError(f"Column '{column}' not found in DataFrame.")
+        err = frame[err_column].to_numpy(dtype=np.float64) if err_column in frame.columns else None
+        series.append((frame['BJD_TDB'].to_numpy(dtype=np.float64),
+                       frame[mag_column].to_numpy(dtype=np.float64), err))
+
+    time = np.concatenate([t for t, _, _ in series])
+    mag = np.concatenate([m for _, m, _ in series])
+    err = None
+    if all(e is not None for _, _, e in series):
+        err = np.concatenate([e for _, _, e in series])
+    return period_search(time, mag, err, **kwargs)
+
+def _power_chunk(task):
+    """Evaluate one chunk of the frequency grid."""
+    method, time, mag, weights, frequency, nbins = task
+    if method == 'ls':
+        return _lomb_scargle(time, mag, weights, frequency)
+    return _pdm(time, mag, frequency, nbins)
+
+def _lomb_scargle(time, mag, weights, frequency):
+    """
+    Generalised Lomb-Scargle power (Zechmeister & Kuerster 2009) for normalised `weights`.
+    """
+    arg = (2.0 * np.pi) * np.outer(frequency, time)
+    cos, sin = np.cos(arg), np.sin(arg)
+
+    y_mean = weights @ mag
+    dy = mag - y_mean
+    yy = weights @ (dy * dy)
+
+    wc, ws = cos @ weights, sin @ weights
+    yc = cos @ (weights * dy)
+    ys = sin @ (weights * dy)
+    cc = (cos * cos) @ weights - wc * wc
+    ss = 1.0 - cc - wc * wc - ws * ws
+    cs = (cos * sin) @ weights - wc * ws
+
+    d = cc * ss - cs * cs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        power = (ss * yc * yc + cc * ys * ys - 2.0 * cs * yc * ys) / (yy * d)
+    return np.nan_to_num(power)
+
+def _pdm(time, mag, frequency, nbins):
+    """
+    Phase dispersion minimisation (Stellingwerf 1978), returned as 1 - theta.
+    """
+    nfreq, npts = frequency.size, time.size
+    phase = np.outer(frequency, time) % 1.0
+    bins = np.minimum((phase * nbins).astype(np.intp), nbins - 1)
+    bins += (np.arange(nfreq) * nbins)[:, None]
+
+    flat = bins.ravel()
+    size = nfreq * nbins
+    tiled = np.broadcast_to(mag, (nfreq, npts)).ravel()
+    count = np.bincount(flat, minlength=size).reshape(nfreq, nbins)
+    total = np.bincount(flat, weights=tiled, minlength=size).reshape(nfreq, nbins)
+    square = np.bincount(flat, weights=tiled * tiled, minlength=size).reshape(nfreq, nbins)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        within = np.where(count > 1, square - total * total / count, 0.0).sum(axis=1)
+        dof = np.where(count > 1, count - 1, 0).sum(axis=1)
+        theta = (within / dof) / mag.var(ddof=1)
+    return np.nan_to_num(1.0 - theta)
+
+def _best_peaks(power, n_peaks):
+    """
+    Indices of the `n_peaks` highest local maxima of `power`, best first. A power with no interior maximum
+    (e.g. rising to the end of the grid) gives the index of its highest value.
+    """
+    if power.size < 3:
+        return np.argsort(power)[::-1][:n_peaks]
+    inner = (power[1:-1] > power[:-2]) & (power[1:-1] >= power[2:])
+    candidates = np.flatnonzero(inner) + 1
+    if candidates.size == 0:
+        return np.array([np.nanargmax(power)]) if n_peaks > 0 and not np.isnan(power).all() else candidates
+    order = np.argsort(power[candidates])[::-1]
+    return candidates[order[:n_peaks]]
@@ -0,0 +1,212 @@
+import csv
+import hashlib
+import json
+import os
+from .core import FileFailure, _run_pool, process_dfs
+from .data import _aavso_convert, _aavso_output_path
+
+MANIFEST_FORMATS = ('.json', '.yaml', '.yml', '.csv')
+
+def load_manifest(path):
+    """
+    Read a batch manifest describing the targets to process.
+
+    JSON and YAML manifests hold a list of targets (or a mapping with a 'targets' list). Each target is a
+    mapping with the keys:
+        name (str): Unique name of the target, used to track its state.
+        files (list): Data files of the target.
+        labels (list, optional): Label of each file. Defaults to the file names.
+        period (float): Period used to fold the data.
+        clean (bool, optional): Whether to clean the data. Defaults to False.
+        plot (str, optional): Image file (PNG, SVG or PDF) to render the folded light curve to.
+        plot_options (dict, optional): Extra render_lightcurve options such as title, bins or error_bars.
+        aavso (dict, optional): {'star_name': ..., 'band': ...} to convert every file with aavso_conv.
+
+    CSV manifests have one row per file with the columns name, file, label, period, clean, plot, star_name
+    and band; rows sharing a name form one target. Relative paths are resolved against the manifest's directory.
+
+    Parameters:
+    path (str): Path to the .json, .yaml/.yml or .csv manifest.
+
+    Returns:
+    list: Normalised target dicts.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as f:
+            raw = json.load(f)
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML manifests requires PyYAML (pip install pyyaml).")
+        with open(path) as f:
+            raw = yaml.safe_load(f)
+    elif extension == '.csv':
+        raw = _read_csv_manifest(path)
+    else:
+        raise ValueError(f"Unsupported manifest format: {extension}. Supported formats are {', '.join(MANIFEST_FORMATS)}.")
+
+    if isinstance(raw, dict):
+        raw = raw.get('targets', [])
+    base = os.path.dirname(os.path.abspath(path))
+    targets = [_normalise_target(target, base) for target in raw]
+
+    names = [target['name'] for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError("Target names in a manifest must be unique.")
+    return targets
+
+def run_manifest(path, state_path=None, jobs=None, force=False, failures=None):
+    """
+    Run every target of a manifest, skipping targets unchanged since the last run.
+
+    A target is skipped when its parameters and the modification time and size of each of its files match
+    the fingerprint recorded in the state file, and its outputs still exist. Targets run in parallel in a
+    process pool; only targets that succeed are recorded.
+
+    Parameters:
+    path (str): Path to the manifest (see load_manifest).
+    state_path (str, optional): JSON file recording the fingerprint of each target. Default is the manifest
+                                path with '.state.json' appended.
+    jobs (int, optional): Number of worker processes. None uses one worker per CPU. Default is None.
+    force (bool, optional): Re-run every target regardless of the state file. Default is False.
+    failures (list, optional): If given, a FileFailure(target name, None, error) record is appended for each
+                               target that failed instead of printing an error message.
+
+    Returns:
+    tuple: (names of the targets run, names of the targets skipped).
+    """
+    targets = load_manifest(path)
+    state_path = state_path or f"{path}.state.json"
+    state = _read_state(state_path)
+
+    pending, skipped = [], []
+    for target in targets:
+        fingerprint = target_fingerprint(target)
+        if not force and state.get(target['name']) == fingerprint and _outputs_exist(target):
+            skipped.append(target['name'])
+        else:
+            pending.append((target, fingerprint))
+
+    if jobs == 1 or len(pending) < 2:
+        results = [_run_target(target) for target, _ in pending]
+    else:
+        results = _run_pool(_run_target, [target for target, _ in pending], jobs)
+
+    ran = []
+    for (target, fingerprint), error in zip(pending, results):
+        if error is None:
+            state[target['name']] = fingerprint
+            ran.append(target['name'])
+        elif failures is None:
+            print(f"Error processing target {target['name']}: {error}")
+        else:
+            failures.append(FileFailure(target['name'], None, error))
+
+    _write_state(state_path, state)
+    return ran, skipped
+
+def target_fingerprint(target):
+    """
+    Hash of a target's parameters and the modification time and size of each of its files.
+    """
+    files = []
+    for name in target['files']:
+        try:
+            stat = os.stat(name)
+            files.append([name, stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            files.append([name, None, None])
+    payload = json.dumps([target, files], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _run_target(target):
+    """Run the stages of one target, returning the error raised or None."""
+    try:
+        if target['plot']:
+            from .render import render_lightcurve
+
+            inner = []
+            dataframes = list(zip(target['files'], target['labels']))
+            processed_data = process_dfs(dataframes, target['period'], clean=target['clean'], failures=inner)
+            if inner:
+                raise inner[0].error
+            render_lightcurve(processed_data, target['plot'], **target['plot_options'])
+
+        if target['aavso']:
+            for name in target['files']:
+                _aavso_convert(name, target['aavso']['star_name'], target['aavso'].get('band', 'Vis.'),
+                               _aavso_output_path(name))
+        return None
+    except Exception as e:
+        return e
+
+def _normalise_target(target, base):
+    """Fill in defaults and resolve paths of one manifest target."""
+    if 'name' not in target or 'files' not in target:
+        raise ValueError("Every manifest target needs a 'name' and a list of 'files'.")
+
+    files = [_resolve(name, base) for name in target['files']]
+    labels = target.get('labels') or [os.path.basename(name) for name in files]
+    if len(labels) != len(files):
+        raise ValueError(f"Target {target['name']}: number of labels must match the number of files.")
+
+    aavso = target.get('aavso') or None
+    if aavso is not None and 'star_name' not in aavso:
+        raise ValueError(f"Target {target['name']}: 'aavso' needs a 'star_name'.")
+    if target.get('plot') and target.get('period') is None:
+        raise ValueError(f"Target {target['name']}: a 'period' is needed to plot.")
+
+    return {
+        'name': str(target['name']),
+        'files': files,
+        'labels': [str(label) for label in labels],
+        'period': None if target.get('period') is None else float(target['period']),
+        'clean': _as_bool(target.get('clean', False)),
+        'plot': _resolve(target['plot'], base) if target.get('plot') else None,
+        'plot_options': dict(target.get('plot_options') or {}),
+        'aavso': dict(aavso) if aavso else None,
+    }
+
+def _read_csv_manifest(path):
+    """Group the rows of a CSV manifest into targets."""
+    targets = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            target = targets.setdefault(row['name'], {'name': row['name'], 'files': [], 'labels': []})
+            target['files'].append(row['file'])
+            target['labels'].append(row.get('label') or os.path.basename(row['file']))
+            for key in ('period', 'clean', 'plot'):
+                if row.get(key):
+                    target[key] = row[key]
+            if row.get('star_name'):
+                target['aavso'] = {'star_name': row['star_name'], 'band': row.get('band') or 'Vis.'}
+    return list(targets.values())
+
+def _resolve(name, base):
+    return name if os.path.isabs(name) else os.path.join(base, name)
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+def _outputs_exist(target):
+    if target['plot'] and not os.path.exists(target['plot']):
+        return False
+    return not target['aavso'] or all(os.path.exists(_aavso_output_path(name)) for name in target['files'])
+
+def _read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
@@ -1,15 +1,17 @@
 import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+from .render import draw_lightcurve
 
 def plot_lightcurve(processed_data, figsize=(10, 6), invert_yaxis=True,
                     ylabel='Magnitude (V)', xlabel='Phase', title='Partial Lightcurve',
                     xlim=(0.0, 1.0), xformatter=lambda x, _: '{:.2f}'.format(x),
-                    grid=True, error_bars=False):
+                    grid=True, error_bars=False, bins=None, bin_stat='mean', max_points=None,
+                    mag_column='Source_AMag_T1', models=None):
     """
     Plot light curves from processed data.
 
     Parameters:
-    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str).
+    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str),
+                           or of folded LightCurve objects.
     figsize (tuple, optional): Figure size (width, height). Default is (10, 6).
     invert_yaxis (bool, optional): Whether to invert the y-axis. Default is True.
     ylabel (str, optional): Y-axis label. Default is 'Magnitude (V)'.
@@ -18,41 +20,31 @@ def plot_lightcurve(processed_data, figsize=(10, 6), invert_yaxis=True,
     xlim (tuple, optional): X-axis limits (min, max). Default is (0.0, 1.0).
     xformatter (function, optional): Formatter function for x-axis ticks. Default formats to two decimal places.
     grid (bool, optional): Whether to show grid lines. Default is True.
-    error_bars (bool, optional): Whether to plot error bars using 'Source_AMag_Err_T1' column. Default is False.
+    error_bars (bool, optional): Whether to plot error bars using the error column of `mag_column`
+                                 (e.g. 'Source_AMag_Err_T1'). Default is False.
+    bins (int, optional): Plot each dataset as this many phase bins instead of raw points. Error bars then show
+                          the scatter within each bin. Default is None.
+    bin_stat (str, optional): Value plotted for each bin, 'mean' or 'median'. Default is 'mean'.
+    max_points (int, optional): Draw at most this many points per dataset, chosen with LTTB downsampling so that
+                                the shape of the curve is kept. Ignored when `bins` is given. Default is None.
+    mag_column (str, optional): Magnitude column plotted from DataFrames, e.g. 'Diff_Mag_T1' after ensemble
+                                photometry (see lyra.ensemble). LightCurves already hold their magnitudes.
+                                Default is 'Source_AMag_T1'.
+    models (list, optional): FourierFit models from lyra.fourier.fit_fourier, one per dataset, overlaid as smooth
+                             curves in the color of their dataset. Default is None.
 
     Raises:
-    ValueError: If 'Source_AMag_T1' column is missing in any processed DataFrame.
-    KeyError: If 'Source_AMag_Err_T1' column is requested for error bars but is missing in any processed DataFrame.
+    ValueError: If `mag_column` is missing in any processed DataFrame.
+    KeyError: If its error column is requested for error bars without `bins` but is missing in any processed
+              DataFrame.
     """
     plt.figure(figsize=figsize)
 
     try:
-        for idx, (df, _, _, label) in enumerate(processed_data):
-            if 'Source_AMag_T1' not in df.columns:
-                raise ValueError("Missing 'Source_AMag_T1' column in DataFrame.")
-
-            if error_bars and 'Source_AMag_Err_T1' not in df.columns:
-                raise KeyError("Missing 'Source_AMag_Err_T1' column for error bars.")
-
-            if error_bars:
-                plt.errorbar(df['BJD_normalized'], df['Source_AMag_T1'], yerr=df['Source_AMag_Err_T1'],
-                             marker='.', linestyle='None', markersize=5, capsize=3, label=label)
-            else:
-                plt.plot(df['BJD_normalized'], df['Source_AMag_T1'], marker='.', linestyle='None', markersize=5, label=label)
-
-        if invert_yaxis:
-            plt.gca().invert_yaxis()
-
-        plt.ylabel(ylabel, fontsize=14)
-        plt.xlabel(xlabel, labelpad=15, fontsize=14)
-        plt.title(title, fontsize=14)
-        plt.xlim(*xlim)
-        plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(xformatter))
-
-        plt.legend()  # Automatically uses labels from each plot
-
-        if grid:
-            plt.grid(True)
+        draw_lightcurve(plt.gca(), processed_data, invert_yaxis=invert_yaxis, ylabel=ylabel, xlabel=xlabel,
+                        title=title, xlim=xlim, xformatter=xformatter, grid=grid, error_bars=error_bars,
+                        bins=bins, bin_stat=bin_stat, max_points=max_points, mag_column=mag_column,
+                        models=models)
 
         plt.tight_layout()
         plt.show()
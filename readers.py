@@ -0,0 +1,264 @@
+import os
+import warnings
+from collections import namedtuple
+from importlib.util import find_spec
+import numpy as np
+import pandas as pd
+
+# One way of parsing a file format. `read(filename, columns)` returns a DataFrame; `chunks(filename, columns,
+# chunksize)`, when given, streams it. `requires` lists the optional modules the engine needs.
+Reader = namedtuple('Reader', ['name', 'read', 'chunks', 'requires'], defaults=(None, ()))
+
+# Delimiters of the text table formats, also used by lyra.watch to parse appended rows
+DELIMITERS = {'.csv': ',', '.tbl': '\t'}
+
+# Columns of AstroImageJ tables that hold text; every other AIJ column is numeric
+AIJ_TEXT_COLUMNS = ('Label',)
+
+# Engines by extension, preferred first. read_table uses the first one whose modules are installed.
+READERS = {}
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a file extension has no known reader."""
+
+def register_reader(extensions, name, read, chunks=None, requires=(), first=True):
+    """
+    Add a reader engine for one or more file extensions.
+
+    Parameters:
+    extensions (str or list): Extensions handled, with the dot (e.g. '.fits').
+    name (str): Name of the engine, used to select it with read_table(..., engine=name).
+    read (function): read(filename, columns) returning a DataFrame. With `columns` it must return only those
+                     of them present in the file, as float64 (see schema).
+    chunks (function, optional): chunks(filename, columns, chunksize) yielding DataFrames of at most
+                                 `chunksize` rows. Default is None, which reads the whole table and slices it.
+    requires (tuple, optional): Modules the engine needs; it is skipped when one is not installed.
+    first (bool, optional): Prefer this engine over those already registered. Default is True.
+    """
+    reader = Reader(name, read, chunks, tuple(requires))
+    for extension in [extensions] if isinstance(extensions, str) else extensions:
+        engines = [r for r in READERS.get(extension.lower(), []) if r.name != name]
+        READERS[extension.lower()] = [reader] + engines if first else engines + [reader]
+
+def readers(filename):
+    """
+    Return the installed engines able to read `filename`, preferred first.
+
+    Raises:
+    UnsupportedFormatError: If no engine is registered for the extension of `filename`.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in READERS:
+        supported = ', '.join(sorted(READERS))
+        raise UnsupportedFormatError(f"Unsupported file format for '{filename}'. Supported formats are {supported}.")
+    return [reader for reader in READERS[extension] if all(_installed(module) for module in reader.requires)]
+
+def read_table(filename, columns=None, engine=None, chunksize=None):
+    """
+    Parse a table with the fastest installed engine for its extension.
+
+    If an engine fails on a file for any reason other than the file being unreadable, a RuntimeWarning naming
+    the engine and the error is issued and the next engine is tried, so an optional engine that is broken or
+    stricter than pandas never costs a load.
+
+    Parameters:
+    filename (str): Path to the table.
+    columns (list, optional): Only read these columns, as float64. Requested columns missing from the file
+                              are skipped. Default is None, which reads every column.
+    engine (str, optional): Name of the engine to use instead of the preferred one. Default is None.
+    chunksize (int, optional): Parse the table in chunks of this many rows (see iter_table), so that only the
+                               selected columns of one chunk are held in memory at a time. Default is None.
+
+    Returns:
+    DataFrame: The table.
+    """
+    if chunksize:
+        chunks = list(iter_table(filename, columns, chunksize))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    engines = readers(filename)
+    if not engines:
+        needed = sorted({module for reader in READERS[os.path.splitext(filename)[1].lower()] for module in reader.requires})
+        raise ImportError(f"Reading '{filename}' needs one of: {', '.join(needed)}.")
+    if engine is not None:
+        engines = [reader for reader in engines if reader.name == engine]
+        if not engines:
+            raise ValueError(f"Reader engine '{engine}' is not available for '{filename}'.")
+    for reader in engines[:-1]:
+        try:
+            return reader.read(filename, columns)
+        except OSError:
+            raise
+        except Exception as e:
+            warnings.warn(f"Reader engine '{reader.name}' failed on '{filename}' ({e!r}); trying the next engine.",
+                          RuntimeWarning, stacklevel=2)
+    return engines[-1].read(filename, columns)
+
+def iter_table(filename, columns=None, chunksize=100_000):
+    """
+    Stream a table as DataFrames of at most `chunksize` rows, with the first installed engine able to stream
+    it; formats that cannot be streamed are read once and sliced.
+    """
+    for reader in readers(filename):
+        if reader.chunks is not None:
+            yield from reader.chunks(filename, columns, chunksize)
+            return
+    df = read_table(filename, columns)
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def delimiter(filename):
+    """Return the delimiter of a text table, or None for other formats."""
+    return DELIMITERS.get(os.path.splitext(filename)[1].lower())
+
+def schema(names, columns=None):
+    """
+    Columns an engine should return, and their dtypes, for a table whose header is `names`.
+
+    With `columns`, those present in the table are returned as float64, in table order. Without, every column
+    is returned; AIJ text columns are strings and the rest have their types inferred (None).
+
+    Returns:
+    dict: Column name to dtype (np.float64, str or None).
+    """
+    if columns is None:
+        return {name: str if name in AIJ_TEXT_COLUMNS else None for name in names}
+    wanted = set(columns)
+    return {name: np.float64 for name in names if name in wanted}
+
+def projection(columns):
+    """
+    usecols/dtype arguments that restrict a pandas reader to `columns`, parsed as float64.
+    """
+    if columns is None:
+        return {}
+    wanted = set(columns)
+    return {'usecols': lambda col: col in wanted, 'dtype': {col: np.float64 for col in columns}}
+
+def _installed(module):
+    try:
+        return find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+def _header(filename, sep):
+    """Column names of a delimited text file, as pandas reads them."""
+    return list(pd.read_csv(filename, sep=sep, nrows=0).columns)
+
+# Text tables (.csv, .tbl)
+
+def _read_csv_pandas(filename, columns=None):
+    return pd.read_csv(filename, delimiter=delimiter(filename), **projection(columns))
+
+def _chunks_csv_pandas(filename, columns, chunksize):
+    yield from pd.read_csv(filename, delimiter=delimiter(filename), chunksize=chunksize, **projection(columns))
+
+def _read_csv_pyarrow(filename, columns=None):
+    """Multi-threaded parse with pyarrow.csv; only the selected columns are converted."""
+    import pyarrow as pa
+    from pyarrow import csv
+
+    sep = delimiter(filename)
+    selected = schema(_header(filename, sep), columns)
+    types = {name: pa.float64() if dtype is np.float64 else pa.string()
+             for name, dtype in selected.items() if dtype is not None}
+    table = csv.read_csv(filename, parse_options=csv.ParseOptions(delimiter=sep),
+                         convert_options=csv.ConvertOptions(include_columns=list(selected), column_types=types))
+    return table.to_pandas()
+
+# Excel workbooks (.xlsx, .xls)
+
+def _read_excel_pandas(filename, columns=None):
+    return pd.read_excel(filename, **projection(columns))
+
+def _read_excel_calamine(filename, columns=None):
+    """pandas' Rust-based calamine engine, several times faster than openpyxl on large workbooks."""
+    return pd.read_excel(filename, engine='calamine', **projection(columns))
+
+def _read_xlsx_stream(filename, columns=None):
+    """
+    Read the first sheet of an .xlsx workbook row by row with openpyxl in read-only mode, keeping only the
+    values of the selected columns, which skips pandas' per-cell conversion.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        names = [str(name) if name is not None else f'Unnamed: {i}' for i, name in enumerate(next(rows, ()))]
+        selected = schema(names, columns)
+        index = [names.index(name) for name in selected]
+        values = [[row[i] if i < len(row) else None for i in index] for row in rows]
+    finally:
+        workbook.close()
+
+    data = {}
+    for k, (name, dtype) in enumerate(selected.items()):
+        column = [row[k] for row in values]
+        if dtype is np.float64:
+            data[name] = np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+        else:
+            data[name] = pd.Series(column, dtype=dtype)
+    return pd.DataFrame(data, columns=list(selected))
+
+# Binary formats, memory-mapped so that only the selected columns are paged in
+
+def _read_arrow(filename, columns=None):
+    from pyarrow import feather
+
+    table = feather.read_table(filename, memory_map=True)
+    return table.select(list(schema(table.column_names, columns))).to_pandas().astype(
+        {} if columns is None else np.float64)
+
+def _read_parquet(filename, columns=None):
+    import pyarrow.parquet as pq
+
+    names = pq.read_schema(filename, memory_map=True).names
+    selected = list(schema(names, columns))
+    return pq.read_table(filename, columns=selected, memory_map=True).to_pandas().astype(
+        {} if columns is None else np.float64)
+
+def _read_fits_astropy(filename, columns=None):
+    """First table extension of a FITS file, opened with memmap; columns are converted to native byte order."""
+    from astropy.io import fits
+
+    with fits.open(filename, memmap=True) as hdus:
+        hdu = next((h for h in hdus if isinstance(h, (fits.BinTableHDU, fits.TableHDU))), None)
+        if hdu is None:
+            raise ValueError(f"No table extension found in '{filename}'.")
+        selected = schema(hdu.columns.names, columns)
+        return pd.DataFrame({name: _native(hdu.data[name], dtype) for name, dtype in selected.items()},
+                            columns=list(selected))
+
+def _read_fits_fitsio(filename, columns=None):
+    import fitsio
+
+    with fitsio.FITS(filename) as hdus:
+        hdu = next((h for h in hdus if h.get_exttype() in ('BINARY_TBL', 'ASCII_TBL')), None)
+        if hdu is None:
+            raise ValueError(f"No table extension found in '{filename}'.")
+        selected = schema(hdu.get_colnames(), columns)
+        data = hdu.read(columns=list(selected))
+    return pd.DataFrame({name: _native(data[name], dtype) for name, dtype in selected.items()},
+                        columns=list(selected))
+
+def _native(values, dtype):
+    """Copy a (big-endian, memory-mapped) FITS column into a native array of `dtype`."""
+    values = np.asarray(values)
+    if dtype is np.float64:
+        return values.astype(np.float64)
+    if values.dtype.kind in 'SU':
+        return np.char.strip(values.astype(str)).astype(object)
+    return values.astype(values.dtype.newbyteorder('='))
+
+# Built-in engines, registered slowest first so that each faster optional engine goes in front
+register_reader(('.csv', '.tbl'), 'pandas', _read_csv_pandas, chunks=_chunks_csv_pandas)
+register_reader(('.csv', '.tbl'), 'pyarrow', _read_csv_pyarrow, requires=('pyarrow',))
+register_reader(('.xlsx', '.xls'), 'pandas', _read_excel_pandas)
+register_reader('.xlsx', 'openpyxl', _read_xlsx_stream, requires=('openpyxl',))
+register_reader(('.xlsx', '.xls'), 'calamine', _read_excel_calamine, requires=('python_calamine',))
+register_reader(('.feather', '.arrow'), 'pyarrow', _read_arrow, requires=('pyarrow',))
+register_reader('.parquet', 'pyarrow', _read_parquet, requires=('pyarrow',))
+register_reader(('.fits', '.fit', '.fts'), 'fitsio', _read_fits_fitsio, requires=('fitsio',))
+register_reader(('.fits', '.fit', '.fts'), 'astropy', _read_fits_astropy, requires=('astropy',))
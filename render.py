@@ -0,0 +1,177 @@
+import os
+import numpy as np
+import matplotlib.ticker as ticker
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from .binning import reduce_points
+from .data import error_column
+from .instrument import stage
+from .lightcurve import dataset_arrays
+
+# Datasets with more points than this are drawn as a raster image inside vector outputs (SVG/PDF)
+RASTERIZE_ABOVE = 5000
+
+# Number of phases at which model curves are drawn
+MODEL_POINTS = 500
+
+# Figure reused by render_batch within each worker process
+_worker_figure = None
+
+def draw_lightcurve(ax, processed_data, invert_yaxis=True, ylabel='Magnitude (V)', xlabel='Phase',
+                    title='Partial Lightcurve', xlim=(0.0, 1.0), xformatter=lambda x, _: '{:.2f}'.format(x),
+                    grid=True, error_bars=False, bins=None, bin_stat='mean', max_points=None,
+                    mag_column='Source_AMag_T1', rasterize_above=RASTERIZE_ABOVE, models=None):
+    """
+    Draw light curves from processed data onto a Matplotlib Axes.
+
+    This holds the drawing shared by plot_lightcurve and render_lightcurve and touches no pyplot state.
+
+    Parameters:
+    ax (Axes): Axes to draw on.
+    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str),
+                           or of folded LightCurve objects.
+    rasterize_above (int, optional): Rasterize the markers of datasets with more points than this, which keeps
+                                     SVG/PDF output small and fast. None never rasterizes. Default is RASTERIZE_ABOVE.
+    models (list, optional): FourierFit models (see lyra.fourier) aligned with `processed_data`, drawn as
+                             smooth curves in the color of their dataset; None entries are skipped. Default is None.
+    The remaining parameters are documented in plot_lightcurve.
+
+    Raises:
+    ValueError: If `mag_column` is missing in any processed DataFrame.
+    KeyError: If its error column is requested for error bars without `bins` but is missing in any processed
+              DataFrame.
+    """
+    with stage('draw', rows_in=sum(_points(item) for item in processed_data)):
+        for index, item in enumerate(processed_data):
+            phase, mag, err, label = dataset_arrays(item, mag_column)
+
+            # With bins, the scatter of each bin is the error bar, so the error column is not needed
+            if error_bars and err is None and not bins:
+                raise KeyError(f"Missing '{error_column(mag_column)}' column for error bars.")
+
+            phase, mag, err = reduce_points(phase, mag, err,
+                                            bins=bins, bin_stat=bin_stat, max_points=max_points, xlim=xlim)
+            rasterized = rasterize_above is not None and len(phase) > rasterize_above
+
+            if error_bars:
+                artist = ax.errorbar(phase, mag, yerr=err, marker='.', linestyle='None', markersize=5, capsize=3,
+                                     label=label, rasterized=rasterized)[0]
+            else:
+                artist, = ax.plot(phase, mag, marker='.', linestyle='None', markersize=5, label=label,
+                                  rasterized=rasterized)
+
+            model = models[index] if models is not None and index < len(models) else None
+            if model is not None:
+                _draw_model(ax, model, xlim, artist.get_color())
+
+        if invert_yaxis:
+            ax.invert_yaxis()
+
+        ax.set_ylabel(ylabel, fontsize=14)
+        ax.set_xlabel(xlabel, labelpad=15, fontsize=14)
+        ax.set_title(title, fontsize=14)
+        ax.set_xlim(*xlim)
+        ax.xaxis.set_major_formatter(ticker.FuncFormatter(xformatter))
+
+        ax.legend()  # Automatically uses labels from each plot
+
+        if grid:
+            ax.grid(True)
+
+def _draw_model(ax, model, xlim, color):
+    """Draw a FourierFit as a smooth line over the x range of the plot."""
+    from .fourier import fourier_model
+    grid = np.linspace(xlim[0], xlim[1], MODEL_POINTS)
+    ax.plot(grid, fourier_model(model, grid), linestyle='-', color=color, label='_nolegend_')
+
+def _points(item):
+    return len(item) if not isinstance(item, tuple) else len(item[0])
+
+def render_lightcurve(processed_data, output, figsize=(10, 6), dpi=150, figure=None, **kwargs):
+    """
+    Render light curves to an image file without a display or pyplot.
+
+    The figure is drawn with the Agg canvas; the output format (PNG, SVG, PDF, ...) follows the extension
+    of `output`.
+
+    Parameters:
+    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str),
+                           or of folded LightCurve objects.
+    output (str): Path of the file to write.
+    figsize (tuple, optional): Figure size (width, height). Default is (10, 6).
+    dpi (int, optional): Resolution of raster output and rasterized markers. Default is 150.
+    figure (Figure, optional): Figure to clear and draw on instead of creating a new one, so that rendering
+                               many files does not rebuild a figure each time. Default is None.
+    **kwargs: Drawing options passed to draw_lightcurve (title, error_bars, bins, max_points, ...).
+
+    Returns:
+    str: The path written.
+    """
+    if figure is None:
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+    else:
+        figure.clear()
+        figure.set_size_inches(figsize)
+
+    ax = figure.add_subplot()
+    draw_lightcurve(ax, processed_data, **kwargs)
+    figure.tight_layout()
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with stage('save', output):
+        figure.savefig(output, dpi=dpi)
+    return output
+
+def render_batch(targets, jobs=None, failures=None):
+    """
+    Process and render many targets to files in a process pool.
+
+    Parameters:
+    targets (list): List of dicts, one per output file, with keys:
+                    'dataframes' (list of (filename, label) tuples), 'period' (float) and 'output' (str), and
+                    optionally 'clean' (bool) and 'plot' (dict of render_lightcurve options such as title).
+    jobs (int, optional): Number of worker processes. None uses one worker per CPU. Default is None.
+    failures (list, optional): If given, a FileFailure(output, None, error) record is appended for each target
+                               that could not be rendered instead of printing an error message.
+
+    Returns:
+    list: Paths of the files written, in the order of `targets`.
+    """
+    from .core import FileFailure, _run_pool
+
+    if jobs == 1 or len(targets) < 2:
+        results = [_render_target(target) for target in targets]
+    else:
+        results = _run_pool(_render_target, targets, jobs)
+
+    written = []
+    for target, error in zip(targets, results):
+        if error is None:
+            written.append(target['output'])
+        elif failures is None:
+            print(f"Error rendering {target['output']}: {error}")
+        else:
+            failures.append(FileFailure(target['output'], None, error))
+    return written
+
+def _render_target(target):
+    """Render one render_batch target, returning the error raised or None."""
+    global _worker_figure
+    from .core import process_dfs
+
+    try:
+        inner = []
+        processed_data = process_dfs(target['dataframes'], target['period'], clean=target.get('clean', False),
+                                     failures=inner)
+        if inner:
+            raise inner[0].error
+        if _worker_figure is None:
+            _worker_figure = Figure()
+            FigureCanvasAgg(_worker_figure)
+        render_lightcurve(processed_data, target['output'], figure=_worker_figure, **target.get('plot', {}))
+        return None
+    except Exception as e:
+        return e
@@ -0,0 +1,450 @@
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Address the server listens on and the CLI looks for; LYRA_SERVER=host:port overrides it
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8737
+
+# Seconds the CLI waits for a server to answer before working locally
+PROBE_TIMEOUT = 0.2
+
+# Header carrying the server's token (see token_path)
+TOKEN_HEADER = 'X-Lyra-Token'
+
+# Host header values accepted besides the address the server listens on, which defeats DNS rebinding
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+class ServerError(RuntimeError):
+    """Raised by Client when the server answers a request with an error."""
+
+def server_address(address=None):
+    """
+    Return the (host, port) of the lyra server: `address` ('host:port' or a tuple), else the LYRA_SERVER
+    environment variable, else (DEFAULT_HOST, DEFAULT_PORT).
+    """
+    address = address or os.environ.get('LYRA_SERVER')
+    if not address:
+        return DEFAULT_HOST, DEFAULT_PORT
+    if isinstance(address, str):
+        host, _, port = address.rpartition(':')
+        return host or DEFAULT_HOST, int(port)
+    host, port = address
+    return host, int(port)
+
+def token_path(address=None):
+    """
+    Return the file holding the token of the lyra server on the port of `address`, in a directory only the
+    user can read ($XDG_RUNTIME_DIR/lyra, else ~/.lyra). Requests without this token are refused, so that web
+    pages and other users cannot reach the server.
+    """
+    _, port = server_address(address)
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    directory = os.path.join(directory, 'lyra') if directory else os.path.join(os.path.expanduser('~'), '.lyra')
+    return os.path.join(directory, f'server-{port}.token')
+
+def _write_token(path):
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+def _read_token(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+class LyraServer(ThreadingHTTPServer):
+    """
+    HTTP server holding a warm lyra process.
+
+    Every connection is handled in its own thread, and the work of each request runs in a shared pool of
+    worker threads. Threads share the interpreter, so the imports, the in-memory table cache (see lyra.cache)
+    and the on-disk cache, when enabled, stay warm across requests, and a slow request does not hold up the
+    others.
+
+    A request is only run if it carries the token written to token_path, has a local Host header and no
+    Origin header, and, for POST, is sent as application/json. Browsers cannot send such a request to
+    another site, so web pages cannot use the server to read or write files.
+
+    Parameters:
+    address (tuple): (host, port) to listen on.
+    workers (int, optional): Number of requests processed at once. None uses one worker per CPU.
+    quiet (bool, optional): Do not log each request to stderr. Default is False.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, quiet=False):
+        super().__init__(address, _Handler)
+        self.token_file = token_path(self.server_address[:2])
+        self.token = _write_token(self.token_file)
+        self.quiet = quiet
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='lyra-worker')
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def run(self, endpoint, payload):
+        """Run `endpoint` on the worker pool and return its JSON-ready reply."""
+        with self._lock:
+            self.requests += 1
+        if endpoint == 'status':
+            return self.status()
+        if endpoint == 'shutdown':
+            # The handler stops the server once this reply is sent
+            return {'stopping': True}
+        return self.pool.submit(ENDPOINTS[endpoint], payload).result()
+
+    def status(self):
+        from .cache import memory_cache_enabled, memory_cache_stats
+        return {'pid': os.getpid(), 'uptime': time.time() - self.started, 'requests': self.requests,
+                'workers': self.workers, 'memory_cache': memory_cache_enabled(),
+                'memory_cache_stats': memory_cache_stats()}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+        if _read_token(self.token_file) == self.token:
+            os.remove(self.token_file)
+
+class _Handler(BaseHTTPRequestHandler):
+    """Decode a JSON request, run its endpoint and write the JSON reply."""
+    server_version = 'lyra'
+
+    def do_GET(self):
+        error = self._refused()
+        if error:
+            return self._reply(403, {'error': error})
+        if self.path.strip('/') != 'status':
+            return self._reply(404, {'error': f"Unknown endpoint '{self.path}'."})
+        self._reply(200, self.server.status())
+
+    def do_POST(self):
+        error = self._refused()
+        if not error and self.headers.get_content_type() != 'application/json':
+            error = "Requests must be sent as application/json."
+        if error:
+            return self._reply(403, {'error': error})
+        endpoint = self.path.strip('/')
+        if endpoint not in ENDPOINTS and endpoint not in ('status', 'shutdown'):
+            return self._reply(404, {'error': f"Unknown endpoint '{self.path}'."})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("Expected a JSON object.")
+        except ValueError as e:
+            return self._reply(400, {'error': f"Invalid request: {e}"})
+        try:
+            self._reply(200, self.server.run(endpoint, payload))
+        except Exception as e:
+            self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+        if endpoint == 'shutdown':
+            self.wfile.flush()
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _refused(self):
+        """Reason to refuse the request, or None if it comes from a local client holding the token."""
+        if 'Origin' in self.headers:
+            return "Cross-origin requests are not accepted."
+        host = (self.headers.get('Host') or '').strip()
+        host = host[1:].partition(']')[0] if host.startswith('[') else host.rpartition(':')[0] or host
+        if host not in LOCAL_HOSTS + (self.server.server_address[0],):
+            return f"Unexpected Host '{host}'."
+        token = (self.headers.get(TOKEN_HEADER) or '').encode('utf-8', 'replace')
+        if not secrets.compare_digest(token, self.server.token.encode()):
+            return "Missing or wrong server token."
+        return None
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def serve(address=None, workers=None, memory_max_bytes=None, quiet=False):
+    """
+    Run the lyra server until it is interrupted or asked to shut down.
+
+    The heavy modules are imported before the first request, so that no request pays for them. Only bind
+    to localhost: requests name files on this machine that the server reads and writes.
+
+    Parameters:
+    address (str or tuple, optional): 'host:port' or (host, port) to listen on. Default is LYRA_SERVER or
+                                      127.0.0.1:8737.
+    workers (int, optional): Number of requests processed at once. None uses one worker per CPU.
+    memory_max_bytes (int, optional): Budget of the in-memory table cache. Default is the lyra.cache setting.
+    quiet (bool, optional): Do not log each request to stderr. Default is False.
+    """
+    from . import core, period, render  # noqa: F401  (warm up)
+    from .cache import configure_cache
+
+    if memory_max_bytes is not None:
+        configure_cache(memory_max_bytes=memory_max_bytes)
+    server = LyraServer(server_address(address), workers, quiet)
+    host, port = server.server_address[:2]
+    print(f"lyra server listening on {host}:{port} with {server.workers} worker(s) (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+class Client:
+    """
+    Thin client of a running lyra server.
+
+    Parameters:
+    address (str or tuple, optional): 'host:port' or (host, port) of the server. Default is LYRA_SERVER or
+                                      127.0.0.1:8737.
+    timeout (float, optional): Seconds to wait for a reply. Default is None (no limit).
+    """
+    def __init__(self, address=None, timeout=None):
+        self.address = server_address(address)
+        self.timeout = timeout
+        self.token = _read_token(token_path(self.address))
+
+    def running(self, timeout=PROBE_TIMEOUT):
+        """Return True if a lyra server answers at this address."""
+        try:
+            self._send('GET', 'status', None, timeout)
+            return True
+        except (OSError, ServerError, ValueError):
+            return False
+
+    def request(self, endpoint, payload=None):
+        """
+        POST `payload` to `endpoint` and return the decoded reply.
+
+        Raises:
+        ServerError: If the server reports an error.
+        OSError: If the server cannot be reached.
+        """
+        return self._send('POST', endpoint, payload or {}, self.timeout)
+
+    def status(self):
+        """Return the server's pid, uptime, request count, workers and in-memory cache statistics."""
+        return self._send('GET', 'status', None, self.timeout)
+
+    def shutdown(self):
+        """Ask the server to stop."""
+        return self.request('shutdown')
+
+    def load_data(self, filename, clean=False, columns=None):
+        """load_data in the server; returns the DataFrame."""
+        import pandas as pd
+        reply = self.request('load', {'filename': os.path.abspath(filename), 'clean': clean, 'columns': columns})
+        return pd.DataFrame(reply['data'], columns=reply['columns'])
+
+    def process_dfs(self, dataframes, period, failures=None, **options):
+        """
+        process_dfs in the server, returning LightCurve objects folded with the period used.
+
+        Parameters:
+        dataframes (list): List of (filename, label) tuples.
+        period (float, str or Ephemeris): As for process_dfs.
+        failures (list, optional): If given, (filename, label, error message) tuples are appended for files
+                                   that failed; otherwise they are printed.
+        **options: Other process_dfs options that JSON can carry (clean, div, ensemble, mag_column, ...).
+        """
+        from .lightcurve import LightCurve
+        payload = dict(options, dataframes=[(os.path.abspath(name), label) for name, label in dataframes],
+                       period=encode_period(period))
+        reply = self.request('process', payload)
+        for message in reply['messages']:
+            print(message)
+        for failure in reply['failures']:
+            if failures is None:
+                print(f"Error processing {failure[0]}: {failure[2]}")
+            else:
+                failures.append(tuple(failure))
+        return [LightCurve(_floats(item['time']), _floats(item['mag']),
+                           None if item['err'] is None else _floats(item['err']), label=item['label'],
+                           period=decode_period(item['period']), div=item['div'], source=item['source'],
+                           mag_column=item['mag_column'])
+                for item in reply['lightcurves']]
+
+    def find_period(self, dataframes, clean=False, **options):
+        """find_period in the server; returns a dict of the 'best_periods' and 'best_powers'."""
+        return self.request('period', dict(options, clean=clean,
+                                           dataframes=[(os.path.abspath(name), label) for name, label in dataframes]))
+
+    def render(self, dataframes, period, output, clean=False, **plot_options):
+        """Process `dataframes` and render their light curves to `output` in the server; returns the path."""
+        reply = self.request('render', {'dataframes': [(os.path.abspath(name), label) for name, label in dataframes],
+                                        'period': encode_period(period), 'output': os.path.abspath(output),
+                                        'clean': clean, 'plot': plot_options})
+        for message in reply['messages']:
+            print(message)
+        return reply['output']
+
+    def aavso_conv(self, inputs, star_name, band='Vis.', output=None, failures=None):
+        """aavso_bulk in the server; returns the paths written."""
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        reply = self.request('aavso', {'inputs': [os.path.abspath(path) for path in inputs], 'star_name': star_name,
+                                       'band': band, 'output': output and os.path.abspath(output)})
+        for failure in reply['failures']:
+            if failures is None:
+                print(f"Error converting {failure[0]}: {failure[2]}")
+            else:
+                failures.append(tuple(failure))
+        return reply['written']
+
+    def _send(self, method, endpoint, payload, timeout):
+        connection = HTTPConnection(*self.address, timeout=timeout)
+        try:
+            body = None if payload is None else json.dumps(payload).encode()
+            connection.request(method, f'/{endpoint}', body=body,
+                               headers={'Content-Type': 'application/json', TOKEN_HEADER: self.token or ''})
+            response = connection.getresponse()
+            reply = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise ServerError(reply.get('error', f"HTTP {response.status}"))
+        return reply
+
+def find_server(address=None):
+    """Return a Client of the lyra server if one is running, else None."""
+    client = Client(address)
+    return client if client.running() else None
+
+def encode_period(period):
+    """JSON form of a period: a number, 'auto', None, or a dict of the fields of an Ephemeris."""
+    if hasattr(period, '_asdict'):
+        return {key: value for key, value in period._asdict().items() if key != 'errors'}
+    return period
+
+def decode_period(period):
+    """Inverse of encode_period."""
+    if isinstance(period, dict):
+        from .timing import Ephemeris
+        return Ephemeris(**period)
+    return period
+
+def _floats(values):
+    import numpy as np
+    return np.array(values, dtype=np.float64)  # null becomes NaN
+
+def _array(values):
+    """JSON list of a float array, with NaN written as null."""
+    import numpy as np
+    return np.where(np.isnan(values), None, values).tolist()
+
+def _dataframes(payload):
+    return [(name, label) for name, label in payload['dataframes']]
+
+def _options(payload, allowed, required=()):
+    """
+    Return the options of a request. Keys outside `allowed` and `required` are refused, so a client cannot
+    reach arguments the endpoint does not expose (such as jobs, which would fork from this threaded process).
+
+    Raises:
+    ValueError: If `payload` has an unknown key or lacks a required one.
+    """
+    unknown = sorted(set(payload) - set(allowed) - set(required))
+    if unknown:
+        raise ValueError(f"Unknown option(s): {', '.join(unknown)}.")
+    missing = [key for key in required if payload.get(key) is None]
+    if missing:
+        raise ValueError(f"Missing option(s): {', '.join(missing)}.")
+    return {key: payload[key] for key in allowed if key in payload}
+
+def _load_endpoint(payload):
+    from .data import _load
+    options = _options(payload, ('clean', 'columns'), required=('filename',))
+    df, _ = _load(payload['filename'], **options)
+    return json.loads(df.to_json(orient='split', index=False))
+
+def _process_endpoint(payload):
+    from .core import process_dfs
+    options = _options(payload, PROCESS_OPTIONS, required=('dataframes', 'period'))
+    failures, messages = [], []
+    curves = process_dfs(_dataframes(payload), decode_period(payload['period']), failures=failures,
+                         lightcurves=True, echo=messages.append, **options)
+    return {'messages': messages,
+            'lightcurves': [{'label': lc.label, 'source': lc.source, 'period': encode_period(lc.period),
+                             'div': lc.div, 'mag_column': lc.mag_column,
+                             'time': _array(lc.time), 'mag': _array(lc.mag),
+                             'err': None if lc.err is None else _array(lc.err)} for lc in curves],
+            'failures': [(f.filename, f.label, str(f.error)) for f in failures]}
+
+def _period_endpoint(payload):
+    from .period import find_period
+    options = _options(payload, PERIOD_OPTIONS, required=('dataframes',))
+    periodogram = find_period(_dataframes(payload), jobs=1, **options)
+    return {'best_periods': periodogram.best_periods.tolist(), 'best_powers': periodogram.best_powers.tolist()}
+
+def _render_endpoint(payload):
+    from .core import process_dfs
+    from .render import render_lightcurve
+    options = _options(payload, ('clean', 'plot'), required=('dataframes', 'period', 'output'))
+    plot_options = _options(options.pop('plot', {}), RENDER_OPTIONS)
+    failures, messages = [], []
+    curves = process_dfs(_dataframes(payload), decode_period(payload['period']), failures=failures,
+                         lightcurves=True, echo=messages.append, **options)
+    if failures:
+        raise failures[0].error
+    return {'output': render_lightcurve(curves, payload['output'], **plot_options), 'messages': messages}
+
+def _plot_endpoint(payload):
+    """
+    The plotting command of the CLI (see lyra.cli), run with its parsed options; the output is returned. The
+    plot must go to a file, as a window cannot be shown from a worker thread, and the files are loaded serially.
+    """
+    import argparse
+    from .cli import _plot
+    options = dict(PLOT_OPTIONS, **_options(payload, PLOT_OPTIONS, required=('files', 'labels', 'output')), jobs=1)
+    if len(options['files']) != len(options['labels']):
+        raise ValueError("Number of labels must match the number of files.")
+    messages = []
+    status = _plot(argparse.Namespace(**options), lambda message, error=False: messages.append((message, error)))
+    return {'status': status or 0, 'messages': messages}
+
+def _aavso_endpoint(payload):
+    from .data import aavso_bulk
+    options = _options(payload, ('band', 'output'), required=('inputs', 'star_name'))
+    failures = []
+    written = aavso_bulk(payload['inputs'], payload['star_name'], jobs=1, failures=failures, **options)
+    return {'written': written, 'failures': [(f.filename, f.label, str(f.error)) for f in failures]}
+
+# Options a request may set, besides the required ones, per endpoint. Anything else is refused; in particular
+# the server always works serially within each request, as forking worker processes from its threads is unsafe.
+PROCESS_OPTIONS = ('clean', 'div', 'ensemble', 'mag_column', 'columns')
+PERIOD_OPTIONS = ('clean', 'method', 'min_period', 'max_period', 'oversample', 'n_peaks', 'nbins', 'mag_column')
+RENDER_OPTIONS = ('title', 'bins', 'bin_stat', 'max_points', 'error_bars', 'mag_column', 'xlabel', 'ylabel',
+                  'invert_yaxis', 'grid', 'figsize', 'dpi')
+
+# Options of the plotting command (see lyra.cli.main) with their defaults
+PLOT_OPTIONS = {'files': None, 'labels': None, 'title': 'Partial Lightcurve', 'period': 1.0, 'epoch': None,
+                'clean': False, 'sigma': None, 'no_cache': False, 'disk_cache': False, 'bins': None,
+                'bin_stat': 'mean', 'max_points': None, 'output': None, 'stitch': False, 'stream': False,
+                'ensemble': False, 'target': 'T1', 'fourier': False, 'max_order': 8}
+
+# Request handlers by endpoint; each takes the decoded JSON payload and returns a JSON-ready reply
+ENDPOINTS = {
+    'load': _load_endpoint,
+    'process': _process_endpoint,
+    'period': _period_endpoint,
+    'render': _render_endpoint,
+    'plot': _plot_endpoint,
+    'aavso': _aavso_endpoint,
+}
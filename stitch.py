@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from .lightcurve import LightCurve, dataset_arrays
+
+def stitch(processed_data, nbins=100, reference=0, label='Stitched', mag_column='Source_AMag_T1',
+           err_column='Source_AMag_Err_T1'):
+    """
+    Align the zero points of many folded nights at once and merge them into one phase-sorted dataset.
+
+    Every point is modelled as m[bin] + o[night]: a common light curve sampled in `nbins` phase bins plus a
+    magnitude offset per night. All offsets are solved together as one weighted least-squares problem
+    (weights 1/err**2) over the overlapping phase coverage of all nights. The bin magnitudes are eliminated
+    from the sparse normal equations, leaving a nights x nights system, so the cost grows with the number of
+    points and nights, not with the number of night pairs.
+
+    Parameters:
+    processed_data (list): List of tuples containing (processed DataFrame, first BJD_normalized value, last BJD_normalized value, label_str),
+                           or of folded LightCurve objects.
+    nbins (int, optional): Number of phase bins of the common light curve. Default is 100.
+    reference (int, optional): Index of the night whose offset is fixed to zero. Default is 0.
+    label (str, optional): Label of the merged dataset. Default is 'Stitched'.
+    mag_column (str, optional): Magnitude column to align. Default is 'Source_AMag_T1'.
+    err_column (str, optional): Uncertainty column used for the weights. If any night lacks it, all points are
+                                weighted equally. Default is 'Source_AMag_Err_T1'.
+
+    Returns:
+    tuple: (merged, offsets). merged is a (DataFrame, first BJD_normalized value, last BJD_normalized value, label)
+    tuple whose DataFrame holds every night's rows with `mag_column` corrected, plus 'Night' and 'Stitch_Offset'
+    columns, sorted by BJD_normalized. If every dataset is a LightCurve, merged is a LightCurve instead, with the
+    night index of each point in meta['night']. offsets is an array of the offset subtracted from each night, in the order
+    of `processed_data`; nights sharing no phase coverage with the reference keep an offset of zero.
+    """
+    if not processed_data:
+        raise ValueError("No datasets to stitch.")
+    nights = len(processed_data)
+    if not 0 <= reference < nights:
+        raise ValueError(f"reference must be between 0 and {nights - 1}.")
+
+    arrays = [dataset_arrays(item, mag_column, err_column) for item in processed_data]
+    phase = np.concatenate([p for p, _, _, _ in arrays])
+    mag = np.concatenate([m for _, m, _, _ in arrays])
+    night = np.repeat(np.arange(nights), [p.size for p, _, _, _ in arrays])
+    if all(e is not None for _, _, e, _ in arrays):
+        err = np.concatenate([e for _, _, e, _ in arrays])
+        with np.errstate(divide='ignore'):
+            weight = 1.0 / err ** 2
+    else:
+        weight = np.ones_like(mag)
+
+    good = np.isfinite(phase) & np.isfinite(mag) & np.isfinite(weight) & (weight > 0)
+    offsets = _solve_offsets(phase[good], mag[good], weight[good], night[good], nights, nbins, reference)
+
+    if all(isinstance(item, LightCurve) for item in processed_data):
+        return _merge_lightcurves(processed_data, offsets, label), offsets
+
+    frames = [item.to_frame() if isinstance(item, LightCurve) else item[0] for item in processed_data]
+    merged = pd.concat([df.assign(Night=night_label, Stitch_Offset=offsets[k])
+                        for k, (df, (_, _, _, night_label)) in enumerate(zip(frames, arrays))], ignore_index=True)
+    merged[mag_column] = merged[mag_column] - merged['Stitch_Offset']
+    merged = merged.sort_values('BJD_normalized', kind='stable', ignore_index=True)
+    return (merged, merged['BJD_normalized'].iloc[0], merged['BJD_normalized'].iloc[-1], label), offsets
+
+def _merge_lightcurves(lightcurves, offsets, label):
+    """Concatenate offset-corrected LightCurves into one, sorted by phase."""
+    phase = np.concatenate([lc.phase for lc in lightcurves])
+    order = np.argsort(phase, kind='stable')
+    time = np.concatenate([lc.time for lc in lightcurves])[order]
+    mag = np.concatenate([lc.mag - offset for lc, offset in zip(lightcurves, offsets)])[order]
+    err = None
+    if all(lc.err is not None for lc in lightcurves):
+        err = np.concatenate([lc.err for lc in lightcurves])[order]
+    night = np.repeat(np.arange(len(lightcurves)), [len(lc) for lc in lightcurves])[order]
+
+    first = lightcurves[0]
+    merged = LightCurve(time, mag, err, label, first.period, first.div,
+                        meta={'night': night, 'offsets': offsets, 'labels': [lc.label for lc in lightcurves]},
+                        mag_column=first.mag_column)
+    merged._phases[(first.period, first.div) if first.period is not None else None] = phase[order]
+    return merged
+
+def _solve_offsets(phase, mag, weight, night, nights, nbins, reference):
+    """
+    Weighted least-squares night offsets of the model mag = m[bin] + o[night], with o[reference] = 0.
+    """
+    lo, hi = phase.min(), phase.max()
+    width = (hi - lo) / nbins if hi > lo else 1.0
+    cell = np.minimum(((phase - lo) / width).astype(np.intp), nbins - 1)
+
+    # Weight sums per (night, bin) and per bin / night, all from bincount
+    joint = np.bincount(night * nbins + cell, weights=weight, minlength=nights * nbins).reshape(nights, nbins)
+    joint_y = np.bincount(night * nbins + cell, weights=weight * mag, minlength=nights * nbins).reshape(nights, nbins)
+    bin_w, night_w = joint.sum(axis=0), joint.sum(axis=1)
+    bin_y, night_y = joint_y.sum(axis=0), joint_y.sum(axis=1)
+
+    used = bin_w > 0
+    joint, bin_w, bin_y = joint[:, used], bin_w[used], bin_y[used]
+
+    # Schur complement of the bin block: (D_o - C D_m^-1 C^T) o = r_o - C D_m^-1 r_m
+    scaled = joint / bin_w
+    matrix = np.diag(night_w) - scaled @ joint.T
+    rhs = night_y - scaled @ bin_y
+
+    offsets = np.zeros(nights)
+    connected = _connected(joint > 0, reference)
+    solve = np.flatnonzero(connected & (np.arange(nights) != reference))
+    if solve.size:
+        offsets[solve] = np.linalg.lstsq(matrix[np.ix_(solve, solve)], rhs[solve], rcond=None)[0]
+
+    if not connected.all():
+        print(f"Warning: {np.count_nonzero(~connected)} night(s) share no phase coverage with the reference "
+              "night and were not shifted.")
+    return offsets
+
+def _connected(overlap, reference):
+    """Nights linked to `reference` through chains of shared phase bins."""
+    reached = np.zeros(overlap.shape[0], dtype=bool)
+    reached[reference] = True
+    while True:
+        bins = overlap[reached].any(axis=0)
+        grown = overlap[:, bins].any(axis=1) | reached
+        if (grown == reached).all():
+            return reached
+        reached = grown
@@ -0,0 +1,13 @@
+import importlib.util
+import os
+import sys
+
+# The package lives at the repository root; make this checkout importable as `lyra` when it is not installed
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if importlib.util.find_spec('lyra') is None:
+    spec = importlib.util.spec_from_file_location('lyra', os.path.join(ROOT, '__init__.py'),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['lyra'] = module
+    spec.loader.exec_module(module)
@@ -0,0 +1,13 @@
+import os
+from lyra.bench import make_aij_table
+from lyra.data import aavso_bulk
+
+def test_bulk_outputs_are_unique(tmp_path):
+    # a.csv and a.tbl would both map to a_aavso_converted.txt
+    for name in ('a.csv', 'a.tbl', 'b.csv'):
+        make_aij_table(str(tmp_path / name), 50)
+
+    written = aavso_bulk([str(tmp_path), str(tmp_path / 'b.csv')], 'V0865 Lyr', jobs=2)
+
+    assert len(written) == len(set(written)) == 3
+    assert all(os.path.exists(path) for path in written)
@@ -0,0 +1,32 @@
+import threading
+from http.client import HTTPConnection
+import pytest
+from lyra.server import TOKEN_HEADER, Client, LyraServer
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    server = LyraServer(('127.0.0.1', 0), workers=1, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _post(server, headers):
+    connection = HTTPConnection(*server.server_address[:2])
+    connection.request('POST', '/status', body=b'{}', headers=headers)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+def test_client_with_token_is_served(server):
+    assert Client(server.server_address[:2]).status()['workers'] == 1
+
+def test_untrusted_requests_are_refused(server):
+    token = {TOKEN_HEADER: server.token}
+    assert _post(server, dict(token, **{'Content-Type': 'application/json'})) == 200
+    assert _post(server, {'Content-Type': 'application/json'}) == 403
+    assert _post(server, dict(token, **{'Content-Type': 'text/plain'})) == 403
+    assert _post(server, dict(token, **{'Content-Type': 'application/json', 'Origin': 'http://evil.example'})) == 403
+    assert _post(server, dict(token, **{'Content-Type': 'application/json', 'Host': 'evil.example'})) == 403
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+import sys
+from lyra.bench import HEAVY_MODULES, check_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _importable(tmp_path, monkeypatch):
+    # Expose this checkout as `lyra` to fresh interpreters
+    (tmp_path / 'lyra').symlink_to(ROOT, target_is_directory=True)
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(filter(None, [str(tmp_path), os.environ.get('PYTHONPATH')])))
+
+def test_import_loads_no_heavy_modules(tmp_path, monkeypatch):
+    _importable(tmp_path, monkeypatch)
+    script = f'import json, sys, lyra; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout) == []
+
+def test_cli_startup_within_budget(tmp_path, monkeypatch):
+    _importable(tmp_path, monkeypatch)
+    result = check_startup()
+    assert result['ok'], result
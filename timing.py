@@ -0,0 +1,323 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .binning import phase_bin
+from .data import AIJ_COLUMNS, _load
+
+# Ephemeris T(E) = epoch + period * E + quadratic * E**2 for cycle number E; quadratic is 0 for a linear one.
+# `errors` holds the standard errors of (epoch, period[, quadratic]) when the ephemeris was fitted.
+Ephemeris = namedtuple('Ephemeris', ['epoch', 'period', 'quadratic', 'errors'], defaults=(0.0, None))
+
+# 'min' times minima of light (magnitude peaks), 'max' times maxima of light
+KINDS = ('min', 'max')
+
+def ephemeris_cycle(time, ephemeris):
+    """
+    Fractional cycle number E of each time under `ephemeris` (0 at the epoch).
+    """
+    dt = np.asarray(time, dtype=np.float64) - ephemeris.epoch
+    if not ephemeris.quadratic:
+        return dt / ephemeris.period
+    # Root of quadratic * E**2 + period * E - dt = 0 closest to the linear solution, without cancellation
+    with np.errstate(invalid='ignore'):
+        return 2.0 * dt / (ephemeris.period + np.sqrt(ephemeris.period ** 2 + 4.0 * ephemeris.quadratic * dt))
+
+def ephemeris_time(cycle, ephemeris):
+    """
+    Time predicted by `ephemeris` for each cycle number.
+    """
+    cycle = np.asarray(cycle, dtype=np.float64)
+    return ephemeris.epoch + ephemeris.period * cycle + ephemeris.quadratic * cycle ** 2
+
+def ephemeris_phase(time, ephemeris, div=True):
+    """
+    Phase of each time under `ephemeris`, 0 at every predicted extremum.
+
+    Parameters:
+    time (array): Observation times (BJD_TDB).
+    ephemeris (Ephemeris): Ephemeris to fold with.
+    div (bool, optional): Return the phase as a fraction of the cycle; otherwise in days, as norm does with
+                          div=False. Default is True.
+
+    Returns:
+    ndarray: Phase of each time.
+    """
+    cycle = ephemeris_cycle(time, ephemeris)
+    phase = cycle - np.floor(cycle)
+    return phase if div else phase * ephemeris.period
+
+def find_extrema(time, mag, err=None, period=None, kind='min', window=None, degree=2, min_points=7, epoch=None,
+                 gap=0.5):
+    """
+    Find every minimum (or maximum) of light in a time series and time it with a local polynomial fit.
+
+    Candidates are found first. With a period, there is one per cycle, centred on the predicted extremum: the
+    faintest (or brightest) phase of the folded curve, or `epoch`. Without a period, there is one per run of
+    observations separated by more than `gap` days, centred on the run's extreme point. The points within
+    `window` of every centre are then fitted with a polynomial of `degree`, weighted by 1/err**2. All candidates
+    are fitted together: their normal equations form one stacked array that NumPy inverts in a single call, and
+    the roots of every derivative come from one batched eigenvalue call. The time of the extremum is the root
+    inside the window and its uncertainty follows from the fit covariance. Candidates with too few points,
+    without `degree` points on each side of the extremum, or whose fit has no extremum of the right kind in the
+    window are dropped.
+
+    Parameters:
+    time (array): Observation times (BJD_TDB).
+    mag (array): Magnitudes (Source_AMag_T1).
+    err (array, optional): Magnitude uncertainties. Default is None (equal weights).
+    period (float or Ephemeris, optional): Period in days, or an ephemeris predicting every extremum.
+    kind (str, optional): 'min' for minima of light or 'max' for maxima. Default is 'min'.
+    window (float, optional): Width in days of the window fitted around each extremum. Default is a tenth
+                              of the period; required when no period is given.
+    degree (int, optional): Degree of the fitted polynomials, at least 2. Default is 2.
+    min_points (int, optional): Least number of points in a window. Default is 7.
+    epoch (float, optional): Time of one extremum, used with a float `period`. Default is None.
+    gap (float, optional): Without a period, gap in days that separates runs of observations. Default is 0.5.
+
+    Returns:
+    DataFrame: One row per extremum, sorted by time, with columns 'Time', 'Time_Err', 'Mag' (fitted magnitude
+    at the extremum) and 'Points' (number of points fitted).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind '{kind}'. Use one of {', '.join(KINDS)}.")
+    if degree < 2:
+        raise ValueError("degree must be at least 2.")
+
+    time = np.asarray(time, dtype=np.float64)
+    mag = np.asarray(mag, dtype=np.float64)
+    weight = np.ones_like(mag) if err is None else np.asarray(err, dtype=np.float64) ** -2.0
+    good = np.isfinite(time) & np.isfinite(mag) & np.isfinite(weight) & (weight > 0)
+    order = np.argsort(time[good], kind='stable')
+    time, mag, weight = time[good][order], mag[good][order], weight[good][order]
+
+    # Magnitudes peak at minimum light
+    sign = 1.0 if kind == 'min' else -1.0
+    if time.size == 0:
+        return _extrema_frame([], [], [], [])
+
+    if period is not None:
+        if not isinstance(period, Ephemeris):
+            if epoch is None:
+                epoch = _folded_extremum(time, mag, period, sign)
+            period = Ephemeris(epoch, period)
+        window = 0.1 * period.period if window is None else window
+        key = np.round(ephemeris_cycle(time, period))
+        centre = ephemeris_time(key, period)
+    else:
+        if window is None:
+            raise ValueError("window is required when no period is given.")
+        key = np.concatenate(([0], np.cumsum(np.diff(time) > gap)))
+        centre = _run_extremum(time, mag, key, sign)[key]
+
+    selected = np.abs(time - centre) <= window / 2
+    _, start, count = np.unique(key[selected], return_index=True, return_counts=True)
+    keep = count >= max(min_points, degree + 2)
+    start, count = start[keep], count[keep]
+    if not start.size:
+        return _extrema_frame([], [], [], [])
+
+    # Pad the windows into (candidates, points) arrays; padding has zero weight
+    t, m, w, c = time[selected], mag[selected], weight[selected], centre[selected]
+    rows = np.repeat(np.arange(start.size), count)
+    cols = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    index = np.repeat(start, count) + cols
+    half = window / 2
+    x, y, wt = (np.zeros((start.size, count.max())) for _ in range(3))
+    x[rows, cols] = (t[index] - c[index]) / half
+    y[rows, cols] = m[index]
+    wt[rows, cols] = w[index]
+    centre = c[start]
+
+    root, value, root_var = _fit_extrema(x, y, wt, count, degree, sign)
+    found = np.isfinite(root)
+    return _extrema_frame(centre[found] + half * root[found], half * np.sqrt(root_var[found]), value[found],
+                          count[found])
+
+def _folded_extremum(time, mag, period, sign):
+    """Time of the faintest (sign 1) or brightest (sign -1) phase bin of the curve folded with `period`."""
+    bins = phase_bin((time % period) / period, mag, nbins=50)
+    phase = bins.center[np.argmax(sign * bins.median)]
+    return (np.floor(time[0] / period) + phase) * period
+
+def _run_extremum(time, mag, run, sign):
+    """Time of the extreme point of each run, after a 5-point running median against single outliers."""
+    padded = np.pad(mag, 2, mode='edge')
+    smooth = np.median(np.lib.stride_tricks.sliding_window_view(padded, 5), axis=1)
+    order = np.lexsort((-sign * smooth, run))
+    first = np.flatnonzero(np.r_[True, np.diff(run[order]) != 0])
+    return time[order[first]]
+
+def _fit_extrema(x, y, w, count, degree, sign):
+    """
+    Weighted polynomial fits of every row of (x, y, w) and the extremum of each.
+
+    Returns (root, value, root_var): position of the extremum in x, fitted value there and variance of the
+    position. Rows without a valid extremum get NaN.
+    """
+    powers = np.arange(degree + 1)
+    design = x[..., None] ** powers
+    normal = np.einsum('gn,gni,gnj->gij', w, design, design)
+    inverse = np.linalg.pinv(normal)
+    coef = np.einsum('gij,gj->gi', inverse, np.einsum('gn,gni,gn->gi', w, design, y))
+
+    residual = y - np.einsum('gni,gi->gn', design, coef)
+    scale = np.einsum('gn,gn,gn->g', w, residual, residual) / np.maximum(count - degree - 1, 1)
+    covariance = inverse * scale[:, None, None]
+
+    # Roots of the derivative as eigenvalues of its companion matrices
+    slope = coef[:, 1:] * powers[1:]
+    k = degree - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        companion = np.zeros((len(coef), k, k))
+        companion[:, 0, :] = -slope[:, -2::-1] / slope[:, -1:]
+        companion[:, np.arange(1, k), np.arange(k - 1)] = 1.0
+    solvable = np.isfinite(companion).all(axis=(1, 2))
+    companion[~solvable] = 0.0
+    roots = np.linalg.eigvals(companion)
+
+    real = roots.real
+    curve = _polyval(coef[:, 2:] * (powers[2:] * (powers[2:] - 1)), real)
+    inside = w[:, None, :] > 0
+    before = np.count_nonzero(inside & (x[:, None, :] < real[..., None]), axis=2)
+    after = np.count_nonzero(inside & (x[:, None, :] > real[..., None]), axis=2)
+    valid = (solvable[:, None] & (np.abs(roots.imag) <= 1e-9 * (1.0 + np.abs(real)))
+             & (sign * curve < 0) & (before >= degree) & (after >= degree))
+
+    value = _polyval(coef, real)
+    best = np.argmax(np.where(valid, sign * value, -np.inf), axis=1)
+    pick = np.arange(len(coef))
+    root, value, curve = real[pick, best], value[pick, best], curve[pick, best]
+
+    # Implicit derivative of slope(root) = 0 with respect to each coefficient
+    gradient = np.zeros_like(coef)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gradient[:, 1:] = -powers[1:] * root[:, None] ** (powers[1:] - 1) / curve[:, None]
+    root_var = np.einsum('gi,gij,gj->g', gradient, covariance, gradient)
+
+    missing = ~valid[pick, best]
+    root[missing] = value[missing] = root_var[missing] = np.nan
+    return root, value, root_var
+
+def _polyval(coef, x):
+    """Evaluate the polynomials of every row of `coef` (lowest power first) at every column of `x`."""
+    return (x[..., None] ** np.arange(coef.shape[1]) * coef[:, None, :]).sum(axis=-1)
+
+def _extrema_frame(time, time_err, mag, points):
+    extrema = pd.DataFrame({'Time': np.asarray(time, dtype=np.float64),
+                            'Time_Err': np.asarray(time_err, dtype=np.float64),
+                            'Mag': np.asarray(mag, dtype=np.float64),
+                            'Points': np.asarray(points, dtype=np.int64)})
+    return extrema.sort_values('Time', ignore_index=True)
+
+def fit_ephemeris(times, period, errors=None, epoch=None, quadratic=False):
+    """
+    Fit a linear or quadratic ephemeris to times of extrema.
+
+    Cycle numbers are counted with the trial `period` from `epoch`, then the ephemeris is fitted by weighted
+    least squares (weights 1/errors**2). Without an epoch, cycle 0 is the extremum nearest the middle of the
+    data, which keeps the fitted epoch and period uncorrelated.
+
+    Parameters:
+    times (array): Times of extrema (e.g. the 'Time' column of find_extrema).
+    period (float or Ephemeris): Trial period in days, or a trial ephemeris whose epoch defines cycle 0. It
+                                 must be accurate enough to count the cycles between extrema.
+    errors (array, optional): Uncertainties of the times. Default is None (equal weights).
+    epoch (float, optional): Trial epoch that defines cycle 0, used with a float `period`. Default is None.
+    quadratic (bool, optional): Also fit a quadratic term, i.e. a steady period change. Default is False.
+
+    Returns:
+    Ephemeris: The fitted ephemeris, with the standard errors of its terms in `errors`. They are scaled by
+    the scatter of the residuals.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    weight = np.ones_like(times) if errors is None else np.asarray(errors, dtype=np.float64) ** -2.0
+    if not np.isfinite(weight).all():
+        weight = np.ones_like(times)
+    good = np.isfinite(times)
+    times, weight = times[good], weight[good]
+
+    terms = 3 if quadratic else 2
+    if times.size < terms:
+        raise ValueError(f"At least {terms} extrema are needed to fit the ephemeris.")
+    trial = period if isinstance(period, Ephemeris) else Ephemeris(times[0] if epoch is None else epoch, period)
+    cycle = np.round(ephemeris_cycle(times, trial))
+    shift = np.round(np.median(cycle)) if trial is not period and epoch is None else 0.0
+    cycle -= shift
+    if np.unique(cycle).size < terms:
+        raise ValueError(f"At least {terms} extrema in different cycles are needed to fit the ephemeris.")
+
+    # Fit relative to the trial prediction for cycle 0 so that the normal equations keep their precision
+    base = float(ephemeris_time(shift, trial))
+    design = cycle[:, None] ** np.arange(terms)
+    normal = design.T @ (weight[:, None] * design)
+    coef = np.linalg.solve(normal, design.T @ (weight * (times - base)))
+
+    residual = times - base - design @ coef
+    scale = weight @ (residual * residual) / max(times.size - terms, 1)
+    errors = np.sqrt(np.diag(np.linalg.inv(normal)) * scale)
+    return Ephemeris(float(base + coef[0]), float(coef[1]), float(coef[2]) if quadratic else 0.0,
+                     tuple(float(e) for e in errors))
+
+def o_minus_c(extrema, ephemeris, fitted=None):
+    """
+    Build the O-C (observed minus calculated) table of timed extrema.
+
+    Parameters:
+    extrema (DataFrame): Times of extrema with 'Time' and optionally 'Time_Err' columns (see find_extrema).
+    ephemeris (Ephemeris): Ephemeris the observed times are compared with.
+    fitted (Ephemeris, optional): Refined ephemeris; adds a 'Residual' column of the times minus its prediction.
+
+    Returns:
+    DataFrame: Columns 'Epoch' (cycle number), 'Time', 'Time_Err', 'Calc' (predicted time) and 'O-C' (days),
+    plus 'Residual' when `fitted` is given.
+    """
+    observed = extrema['Time'].to_numpy(dtype=np.float64)
+    cycle = np.round(ephemeris_cycle(observed, ephemeris))
+    table = pd.DataFrame({'Epoch': cycle.astype(np.int64), 'Time': observed,
+                          'Time_Err': extrema['Time_Err'] if 'Time_Err' in extrema.columns else np.nan})
+    table['Calc'] = ephemeris_time(cycle, ephemeris)
+    table['O-C'] = table['Time'] - table['Calc']
+    if fitted is not None:
+        table['Residual'] = observed - ephemeris_time(np.round(ephemeris_cycle(observed, fitted)), fitted)
+    return table
+
+def timing_analysis(dataframes, period, clean=False, kind='min', window=None, degree=2, min_points=7, epoch=None,
+                    quadratic=False):
+    """
+    Time every extremum in the given files, fit an updated ephemeris and build the O-C table.
+
+    Parameters:
+    dataframes (list): List of tuples where each tuple contains (filename, label).
+    period (float or Ephemeris): Trial period in days, or a trial ephemeris.
+    clean (bool, optional): Whether to perform data cleaning on the loaded DataFrames. Default is False.
+    kind, window, degree, min_points: See find_extrema.
+    epoch (float, optional): Time of one extremum, used with a float `period`. Default is None.
+    quadratic (bool, optional): Fit a quadratic ephemeris instead of a linear one. Default is False.
+
+    Returns:
+    tuple: (table, ephemeris). table is the O-C table of o_minus_c against the trial ephemeris, with the
+    residuals from the fitted one; ephemeris is the fitted Ephemeris, which norm and process_dfs can fold with.
+    """
+    frames = [_load(name_str, clean=clean, columns=AIJ_COLUMNS)[0] for name_str, _ in dataframes]
+    if not frames:
+        raise ValueError("No data to time.")
+    for frame in frames:
+        for column in ('BJD_TDB', 'Source_AMag_T1'):
+            if column not in frame.columns:
+                raise KeyError(f"Column '{column}' not found in DataFrame.")
+    time = np.concatenate([frame['BJD_TDB'].to_numpy(dtype=np.float64) for frame in frames])
+    mag = np.concatenate([frame['Source_AMag_T1'].to_numpy(dtype=np.float64) for frame in frames])
+    err = None
+    if all('Source_AMag_Err_T1' in frame.columns for frame in frames):
+        err = np.concatenate([frame['Source_AMag_Err_T1'].to_numpy(dtype=np.float64) for frame in frames])
+
+    extrema = find_extrema(time, mag, err, period, kind=kind, window=window, degree=degree,
+                           min_points=min_points, epoch=epoch)
+    if extrema.empty:
+        raise ValueError("No extrema could be timed; check the period and window.")
+
+    ephemeris = fit_ephemeris(extrema['Time'], period, extrema['Time_Err'], epoch=epoch, quadratic=quadratic)
+    trial = period
+    if not isinstance(trial, Ephemeris):
+        trial = Ephemeris(ephemeris.epoch if epoch is None else epoch, period)
+    return o_minus_c(extrema, trial, fitted=ephemeris), ephemeris
@@ -0,0 +1,237 @@
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+from .core import norm
+from .data import AIJ_COLUMNS, clean_data
+from .readers import READERS, delimiter, projection, read_table
+
+class _FollowedFile:
+    """
+    Read position and folded rows of one table being followed.
+
+    The folded rows are kept in one growable array per column, whose capacity doubles when full, so that
+    appending a batch only copies the new rows and frame() returns views without concatenating.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.names = None
+        self.mtime = None
+        self.buffers = {}
+        self.rows = 0
+
+    def reset(self):
+        # Forget the mtime too, so that a file whose read failed is read again on the next poll
+        self.offset = 0
+        self.names = None
+        self.mtime = None
+        self.buffers = {}
+        self.rows = 0
+
+    def append(self, df):
+        """Copy the rows of `df` to the end of the column buffers."""
+        if self.rows and list(df.columns) != list(self.buffers):
+            # The columns changed between batches: realign what is held so far with the new batch
+            df = pd.concat([self.frame(), df], ignore_index=True)
+            self.buffers = {}
+            self.rows = 0
+        end = self.rows + len(df)
+        for name in df.columns:
+            values = df[name].to_numpy()
+            buffer = self.buffers.get(name)
+            if buffer is None:
+                buffer = np.empty(max(end, 1024), dtype=values.dtype)
+            elif buffer.dtype != values.dtype and np.promote_types(buffer.dtype, values.dtype) != buffer.dtype:
+                buffer = buffer.astype(np.promote_types(buffer.dtype, values.dtype))
+            if end > len(buffer):
+                grown = np.empty(max(end, 2 * len(buffer)), dtype=buffer.dtype)
+                grown[:self.rows] = buffer[:self.rows]
+                buffer = grown
+            buffer[self.rows:end] = values
+            self.buffers[name] = buffer
+        self.rows = end
+
+    def frame(self):
+        """Return the folded rows as a DataFrame sharing memory with the buffers."""
+        return pd.DataFrame({name: buffer[:self.rows] for name, buffer in self.buffers.items()}, copy=False)
+
+class Watcher:
+    """
+    Follow a directory of AstroImageJ measurement tables and keep them folded in memory.
+
+    Each poll lists the directory and reads only what changed: new files are read once, and for delimited
+    text tables (CSV/TBL, see lyra.readers.DELIMITERS) that grew only the complete rows appended since the
+    last poll are parsed and folded with norm. A file that shrank or was rewritten is read again from the
+    start; Excel and the other formats of lyra.readers, which cannot be appended to, are re-read with
+    read_table whenever they change.
+
+    Parameters:
+    directory (str): Directory written by AstroImageJ.
+    period (float): Period used to fold the data.
+    clean (bool, optional): Whether to clean each batch of new rows with clean_data. Default is False.
+    div (bool, optional): Whether to normalize by dividing by the period. Default is True.
+    columns (list, optional): Columns read from each table. Default is AIJ_COLUMNS.
+    """
+    def __init__(self, directory, period, clean=False, div=True, columns=AIJ_COLUMNS):
+        self.directory = directory
+        self.period = period
+        self.clean = clean
+        self.div = div
+        self.columns = None if columns is None else tuple(columns)
+        self._files = {}
+
+    def poll(self):
+        """
+        Read new and appended rows of every table in the directory.
+
+        Returns:
+        int: Number of new rows folded in this poll.
+        """
+        added = 0
+        for entry in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, entry)
+            # Every format lyra.readers can read is followed
+            if os.path.splitext(entry)[1].lower() not in READERS or not os.path.isfile(path):
+                continue
+            followed = self._files.setdefault(path, _FollowedFile(path))
+            try:
+                added += self._update(followed)
+            except (OSError, ValueError, ImportError, pd.errors.ParserError) as e:
+                # Usually a table caught mid-write, read again on the next poll, or a format whose engine is missing
+                print(f"Error reading {path}: {e}")
+                followed.reset()
+        return added
+
+    def processed_data(self):
+        """
+        Return the folded tables in the process_dfs format.
+
+        Returns:
+        list: List of tuples containing (DataFrame, first BJD_normalized value, last BJD_normalized value, label).
+        """
+        processed_data = []
+        for path in sorted(self._files):
+            followed = self._files[path]
+            if not followed.rows:
+                continue
+            bjd = followed.buffers['BJD_normalized']
+            processed_data.append((followed.frame(), bjd[0], bjd[followed.rows - 1], os.path.basename(path)))
+        return processed_data
+
+    def _update(self, followed):
+        stat = os.stat(followed.path)
+        sep = delimiter(followed.path)
+        if sep is None:
+            if stat.st_mtime_ns == followed.mtime:
+                return 0
+            followed.reset()
+            df = read_table(followed.path, self.columns)
+            followed.mtime = stat.st_mtime_ns
+            return self._fold(followed, df)
+
+        if stat.st_size < followed.offset or (stat.st_size == followed.offset and stat.st_mtime_ns != followed.mtime):
+            # Truncated or rewritten in place: start over
+            followed.reset()
+        followed.mtime = stat.st_mtime_ns
+        if stat.st_size == followed.offset:
+            return 0
+
+        with open(followed.path, 'rb') as f:
+            f.seek(followed.offset)
+            data = f.read()
+
+        # Only consume complete lines; a partly written row is picked up next time
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        text = io.BytesIO(data[:end])
+
+        options = dict(projection(self.columns), delimiter=sep)
+        if followed.names is None:
+            followed.names = list(pd.read_csv(io.BytesIO(data[:end]), nrows=0, delimiter=sep).columns)
+            df = pd.read_csv(text, **options)
+        else:
+            df = pd.read_csv(text, header=None, names=followed.names, **options)
+        followed.offset += end
+        return self._fold(followed, df)
+
+    def _fold(self, followed, df):
+        if df.empty:
+            return 0
+        if self.clean:
+            df = clean_data(df, followed.path)
+        df, _, _ = norm(df, os.path.basename(followed.path), self.period, self.div)
+        if df is None:
+            return 0
+        followed.append(df)
+        return len(df)
+
+def watch(directory, period, output=None, interval=5.0, clean=False, div=True, polls=None, plot_options=None):
+    """
+    Follow a directory and refresh the folded light curve whenever new rows arrive.
+
+    Parameters:
+    directory (str): Directory written by AstroImageJ.
+    period (float): Period used to fold the data.
+    output (str, optional): Image file re-rendered after each update. Default is None, which shows and updates
+                            an interactive window instead.
+    interval (float, optional): Seconds between polls. Default is 5.
+    clean (bool, optional): Whether to clean new rows with clean_data. Default is False.
+    div (bool, optional): Whether to normalize by dividing by the period. Default is True.
+    polls (int, optional): Stop after this many polls. Default is None, which runs until interrupted.
+    plot_options (dict, optional): Drawing options for draw_lightcurve (title, bins, max_points, ...).
+
+    Returns:
+    Watcher: The watcher, holding the folded data.
+    """
+    watcher = Watcher(directory, period, clean=clean, div=div)
+    plot_options = plot_options or {}
+    figure = None
+    count = 0
+    try:
+        while polls is None or count < polls:
+            count += 1
+            added = watcher.poll()
+            if added:
+                processed_data = watcher.processed_data()
+                total = sum(len(df) for df, _, _, _ in processed_data)
+                print(f"Folded {added} new row(s); {total} row(s) in {len(processed_data)} table(s).")
+                figure = _refresh(processed_data, output, figure, plot_options)
+            if polls is None or count < polls:
+                _wait(interval, figure)
+    except KeyboardInterrupt:
+        pass
+    return watcher
+
+def _refresh(processed_data, output, figure, plot_options):
+    """Redraw the light curve to `output`, or to an interactive window, reusing `figure`."""
+    if output:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from .render import render_lightcurve
+
+        if figure is None:
+            figure = Figure()
+            FigureCanvasAgg(figure)
+        render_lightcurve(processed_data, output, figure=figure, **plot_options)
+        return figure
+
+    import matplotlib.pyplot as plt
+    from .render import draw_lightcurve
+
+    if figure is None:
+        plt.ion()
+        figure = plt.figure(figsize=(10, 6))
+    figure.clear()
+    draw_lightcurve(figure.add_subplot(), processed_data, **plot_options)
+    figure.canvas.draw_idle()
+    return figure
+
+def _wait(interval, figure):
+    if figure is not None and hasattr(figure.canvas, 'start_event_loop') and figure.canvas.manager is not None:
+        # Keep the interactive window responsive while waiting
+        figure.canvas.start_event_loop(interval)
+    else:
+        time.sleep(interval)